@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+
+# ============================================================================
+# Reader registry
+# ============================================================================
+
+# Each format is mapped to the qualified name of its loader, so that the
+# corresponding module (and the framework it depends on) is imported only
+# when a network is actually read
+READERS = {
+    'keras': 'eml.net.reader.keras_reader:read_keras_sequential',
+    'keras_file': 'eml.net.reader.keras_reader:read_keras_file',
+    'saved_model': 'eml.net.reader.saved_model_reader:read_saved_model',
+    'sklearn': 'eml.net.reader.sklearn_reader:read_sklearn_mlp',
+    'weights': 'eml.net.reader.weights_reader:read_weights',
+    'native': 'eml.net.serialize:load',
+}
+
+
+def register(fmt, loader):
+    """ Register a reader for a format
+
+    Parameters
+    ----------
+        fmt : string
+            Name of the format
+        loader : string or callable
+            Either a loader function or its qualified name, in the form
+            `module:function`, which is imported lazily
+
+    Returns
+    -------
+        None
+
+    """
+    READERS[fmt] = loader
+
+
+def formats():
+    """ Get the available formats
+
+    Returns
+    -------
+        Formats : list(string)
+            Names of the registered formats
+
+    """
+    return sorted(READERS)
+
+
+def get_reader(fmt):
+    """ Get the loader function of a format
+
+    Parameters
+    ----------
+        fmt : string
+            Name of the format
+
+    Returns
+    -------
+        Loader : callable
+            Function returning a :obj:`eml.net.describe.DNRNet`
+
+    Raises
+    ------
+        ValueError
+            If the format is not registered
+
+    """
+    if fmt not in READERS:
+        raise ValueError('Unknown format "%s", available formats are %s' % (fmt, formats()))
+    loader = READERS[fmt]
+    if isinstance(loader, str):
+        module, function = loader.split(':')
+        loader = getattr(importlib.import_module(module), function)
+    return loader
+
+
+def read(fmt, source, *args, **kwargs):
+    """ Read a neural network in the given format
+
+    Parameters
+    ----------
+        fmt : string
+            Name of the format
+        source : object
+            Model or path to be read, as expected by the format loader
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    """
+    return get_reader(fmt)(source, *args, **kwargs)
@@ -1,8 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import tensorflow.keras.layers as klayers
-
 from eml.net import describe
 
 # import importlib
@@ -38,6 +36,8 @@ def read_keras_sequential(kmodel):
             If the layer type is not supported
 
     """ 
+    # Import keras only when a model is actually read
+    import tensorflow.keras.layers as klayers
     # Build a DNR network model
     net = describe.DNRNet()
     # Add input layer
@@ -57,6 +57,24 @@ def read_keras_sequential(kmodel):
     return net
 
 
+def read_keras_file(path):
+    """ Import neural network model from a keras model saved on disk
+
+    Parameters
+    ----------
+        path : string
+            Path of the keras model (e.g. a SavedModel folder)
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    """
+    from tensorflow import keras
+    return read_keras_sequential(keras.models.load_model(path))
+
+
 # if __name__ == '__main__':
 #     # Build a random training set
 #     ns, na, nh, no = 100, 3, 2, 1
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import struct
+import numpy as np
+
+from eml.net import describe
+
+# ============================================================================
+# Minimal protocol buffer decoding
+# ============================================================================
+
+# Field numbers of the (few) protocol buffer messages that are needed
+SAVED_MODEL_META_GRAPHS = 2         # SavedModel.meta_graphs
+META_GRAPH_OBJECT_GRAPH = 7         # MetaGraphDef.object_graph_def
+OBJECT_GRAPH_NODES = 1              # SavedObjectGraph.nodes
+OBJECT_USER_OBJECT = 4              # SavedObject.user_object
+USER_OBJECT_METADATA = 3            # SavedUserObject.metadata
+KERAS_METADATA_NODES = 1            # SavedMetadata.nodes
+KERAS_NODE_PATH = 3                 # keras SavedObject.node_path
+KERAS_NODE_METADATA = 5             # keras SavedObject.metadata
+BUNDLE_HEADER_NUM_SHARDS = 1        # BundleHeaderProto.num_shards
+BUNDLE_HEADER_ENDIANNESS = 2        # BundleHeaderProto.endianness
+BUNDLE_ENTRY_DTYPE = 1              # BundleEntryProto.dtype
+BUNDLE_ENTRY_SHAPE = 2              # BundleEntryProto.shape
+BUNDLE_ENTRY_SHARD_ID = 3           # BundleEntryProto.shard_id
+BUNDLE_ENTRY_OFFSET = 4             # BundleEntryProto.offset
+BUNDLE_ENTRY_SIZE = 5               # BundleEntryProto.size
+SHAPE_DIM = 2                       # TensorShapeProto.dim
+DIM_SIZE = 1                        # TensorShapeProto.Dim.size
+
+# Map TensorFlow data types to NumPy ones (little-endian)
+DTYPES = {1: '<f4', 2: '<f8', 3: '<i4', 4: '<u1', 5: '<i2', 6: '<i1',
+        9: '<i8', 10: '?', 17: '<u2', 19: '<f2', 22: '<u4', 23: '<u8'}
+
+# Magic number of the tables used for the tensor bundle index
+TABLE_MAGIC = 0xdb4775248b80fb57
+FOOTER_SIZE = 48
+BLOCK_TRAILER_SIZE = 5
+
+# Name of the checkpoint entries storing the weights of keras layers
+VARIABLE_KEY = 'layer_with_weights-%d/%s/.ATTRIBUTES/VARIABLE_VALUE'
+
+
+def _read_varint(buf, pos):
+    """ Decode a base 128 varint
+
+    Parameters
+    ----------
+        buf : bytes
+            Encoded data
+        pos : int
+            Position of the first byte of the varint
+
+    Returns
+    -------
+        Value and next position : (int, int)
+            Decoded value and position of the following byte
+
+    """
+    value, shift = 0, 0
+    while True:
+        byte = buf[pos]
+        value |= (byte & 0x7f) << shift
+        pos += 1
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _decode_message(buf):
+    """ Decode the fields of a protocol buffer message
+
+    Since no schema is available, varints are returned as (unsigned)
+    integers, length-delimited fields as bytes (to be further decoded
+    as strings or nested messages by the caller), and fixed size fields
+    as raw bytes
+
+    Parameters
+    ----------
+        buf : bytes
+            Encoded message
+
+    Returns
+    -------
+        Fields : dict(int, list)
+            Values of each field number, in order of appearance
+
+    Raises
+    ------
+        ValueError
+            If the wire type is not supported
+
+    """
+    fields, pos = {}, 0
+    while pos < len(buf):
+        tag, pos = _read_varint(buf, pos)
+        number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            size, pos = _read_varint(buf, pos)
+            value, pos = buf[pos:pos + size], pos + size
+        elif wire_type == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError('Unsupported wire type %d' % wire_type)
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+def _field(fields, number, default=None):
+    """ Get the last value of a field (i.e. the protocol buffer semantic)
+
+    Parameters
+    ----------
+        fields : dict(int, list)
+            Decoded message
+        number : int
+            Field number
+        default : object
+            Value returned if the field is missing (default None)
+
+    Returns
+    -------
+        Value : object
+            Value of the field
+
+    """
+    return fields[number][-1] if number in fields else default
+
+# ============================================================================
+# Tensor bundle
+# ============================================================================
+
+def _read_block(data, offset, size):
+    """ Decode the entries of a table block
+
+    Parameters
+    ----------
+        data : bytes
+            Content of the table file
+        offset : int
+            Offset of the block
+        size : int
+            Size of the block (trailer excluded)
+
+    Returns
+    -------
+        Entries : list((bytes, bytes))
+            Keys and values stored in the block
+
+    Raises
+    ------
+        ValueError
+            If the block is compressed
+
+    """
+    if data[offset + size] != 0:
+        raise ValueError('Compressed tensor bundle tables are not supported')
+    block = data[offset:offset + size]
+    num_restarts, = struct.unpack('<I', block[-4:])
+    end = len(block) - 4 * (num_restarts + 1)
+    # Keys are prefix compressed with respect to the previous one
+    entries, key, pos = [], b'', 0
+    while pos < end:
+        shared, pos = _read_varint(block, pos)
+        non_shared, pos = _read_varint(block, pos)
+        value_size, pos = _read_varint(block, pos)
+        key = key[:shared] + block[pos:pos + non_shared]
+        pos += non_shared
+        entries.append((key, block[pos:pos + value_size]))
+        pos += value_size
+    return entries
+
+
+def _read_table(path):
+    """ Read all the entries of a table (i.e. the tensor bundle index)
+
+    Parameters
+    ----------
+        path : string
+            Path of the table file
+
+    Returns
+    -------
+        Entries : dict(string, bytes)
+            Values indexed by their key
+
+    Raises
+    ------
+        ValueError
+            If the file is not a valid table
+
+    """
+    with open(path, 'rb') as fin:
+        data = fin.read()
+    footer = data[-FOOTER_SIZE:]
+    if struct.unpack('<Q', footer[-8:])[0] != TABLE_MAGIC:
+        raise ValueError('Invalid tensor bundle index "%s"' % path)
+    # The footer stores the handles of the meta index and of the index
+    _, pos = _read_varint(footer, 0)
+    _, pos = _read_varint(footer, pos)
+    index_offset, pos = _read_varint(footer, pos)
+    index_size, pos = _read_varint(footer, pos)
+    # Each index entry points to a data block
+    entries = {}
+    for _, handle in _read_block(data, index_offset, index_size):
+        offset, pos = _read_varint(handle, 0)
+        size, pos = _read_varint(handle, pos)
+        for key, value in _read_block(data, offset, size):
+            entries[key.decode('utf-8')] = value
+    return entries
+
+
+def read_tensor_bundle(prefix, keys=None):
+    """ Read tensors from a TensorFlow checkpoint (tensor bundle)
+
+    Parameters
+    ----------
+        prefix : string
+            Prefix of the bundle files (e.g. `<saved model>/variables/variables`)
+        keys : list(string)
+            Keys of the tensors to be read (default None, i.e. all the
+            tensors with a supported data type)
+
+    Returns
+    -------
+        Tensors : dict(string, :obj:`numpy.ndarray`)
+            Tensors indexed by their key
+
+    Raises
+    ------
+        ValueError
+            If a tensor is missing or its data type is not supported
+
+    """
+    entries = _read_table(prefix + '.index')
+    header = _decode_message(entries.pop(''))
+    if _field(header, BUNDLE_HEADER_ENDIANNESS, 0) != 0:
+        raise ValueError('Only little-endian tensor bundles are supported')
+    num_shards = _field(header, BUNDLE_HEADER_NUM_SHARDS, 1)
+    # Decode the requested entries
+    tensors, shards = {}, {}
+    for key in (entries if keys is None else keys):
+        if key not in entries:
+            raise ValueError('Missing tensor "%s"' % key)
+        entry = _decode_message(entries[key])
+        dtype = _field(entry, BUNDLE_ENTRY_DTYPE, 0)
+        if dtype not in DTYPES:
+            if keys is None:
+                continue
+            raise ValueError('Unsupported data type %d for tensor "%s"' % (dtype, key))
+        shape = _decode_message(_field(entry, BUNDLE_ENTRY_SHAPE, b''))
+        shape = tuple(_field(_decode_message(dim), DIM_SIZE, 0) for dim in shape.get(SHAPE_DIM, []))
+        shard = _field(entry, BUNDLE_ENTRY_SHARD_ID, 0)
+        if shard not in shards:
+            shard_path = '%s.data-%05d-of-%05d' % (prefix, shard, num_shards)
+            with open(shard_path, 'rb') as fin:
+                shards[shard] = fin.read()
+        offset = _field(entry, BUNDLE_ENTRY_OFFSET, 0)
+        size = _field(entry, BUNDLE_ENTRY_SIZE, 0)
+        value = np.frombuffer(shards[shard][offset:offset + size], dtype=DTYPES[dtype])
+        tensors[key] = value.astype(value.dtype.newbyteorder('=')).reshape(shape)
+    return tensors
+
+# ============================================================================
+# Keras metadata
+# ============================================================================
+
+def _read_keras_metadata(path):
+    """ Read the keras metadata of the root object of a SavedModel
+
+    The metadata is stored in `keras_metadata.pb` by recent versions of
+    keras, and in the object graph of `saved_model.pb` by older ones
+
+    Parameters
+    ----------
+        path : string
+            Path of the SavedModel folder
+
+    Returns
+    -------
+        Metadata : dict
+            Decoded JSON metadata of the keras model
+
+    Raises
+    ------
+        ValueError
+            If no keras metadata is found
+
+    """
+    metadata = None
+    keras_path = os.path.join(path, 'keras_metadata.pb')
+    if os.path.exists(keras_path):
+        with open(keras_path, 'rb') as fin:
+            nodes = _decode_message(fin.read()).get(KERAS_METADATA_NODES, [])
+        for node in nodes:
+            node = _decode_message(node)
+            if _field(node, KERAS_NODE_PATH, b'') == b'root':
+                metadata = _field(node, KERAS_NODE_METADATA)
+    if metadata is None:
+        with open(os.path.join(path, 'saved_model.pb'), 'rb') as fin:
+            saved_model = _decode_message(fin.read())
+        meta_graph = _decode_message(saved_model[SAVED_MODEL_META_GRAPHS][0])
+        object_graph = _decode_message(_field(meta_graph, META_GRAPH_OBJECT_GRAPH, b''))
+        # The root object (i.e. the model) is the first node of the graph
+        root = _decode_message(object_graph[OBJECT_GRAPH_NODES][0])
+        user_object = _decode_message(_field(root, OBJECT_USER_OBJECT, b''))
+        metadata = _field(user_object, USER_OBJECT_METADATA)
+    if not metadata:
+        raise ValueError('No keras metadata found in "%s"' % path)
+    return json.loads(metadata.decode('utf-8'))
+
+# ============================================================================
+# Reader
+# ============================================================================
+
+def read_saved_model(path):
+    """ Import neural network model from a keras SavedModel
+
+    Builds the same network of
+    :func:`eml.net.reader.keras_reader.read_keras_sequential` without
+    TensorFlow, by reading the layer configuration from the keras metadata
+    and the weights from the variables checkpoint
+
+    Parameters
+    ----------
+        path : string
+            Path of the SavedModel folder
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    Raises
+    ------
+        ValueError
+            If the model is not sequential or the layer type is not supported
+
+    """
+    metadata = _read_keras_metadata(path)
+    if metadata.get('class_name') != 'Sequential':
+        raise ValueError('Unsupported model type')
+    klayers = [l for l in metadata['config']['layers'] if l['class_name'] != 'InputLayer']
+    if any(l['class_name'] != 'Dense' for l in klayers):
+        raise ValueError('Unsupported layer type')
+    # Dense layers are the only ones with weights, thus their index in the
+    # checkpoint is their position among the (non input) layers
+    keys = [VARIABLE_KEY % (k, v) for k in range(len(klayers)) for v in ('kernel', 'bias')]
+    tensors = read_tensor_bundle(os.path.join(path, 'variables', 'variables'), keys)
+    # Build a DNR network model
+    net = describe.DNRNet()
+    # Add input layer
+    wgt = tensors[VARIABLE_KEY % (0, 'kernel')]
+    net.add(describe.DNRInput(input_shape=wgt.shape[:1]))
+    # Add the dense layers
+    for k, klayer in enumerate(klayers):
+        wgt = tensors[VARIABLE_KEY % (k, 'kernel')]
+        bias = tensors[VARIABLE_KEY % (k, 'bias')]
+        net.add(describe.DNRDense(wgt, bias, klayer['config']['activation']))
+    # Return the network
+    return net
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from eml.net import describe
+
+# Map scikit-learn activation names to the supported ones
+ACTIVATIONS = {'relu': 'relu', 'identity': 'linear'}
+
+
+def read_sklearn_mlp(skmodel):
+    """ Import neural network model from scikit-learn
+
+    Casts a trained multi-layer perceptron into custom representation,
+    available at :obj:`eml.net.describe.DNRNet`. Scikit-learn is not
+    imported, since only the fitted attributes of the model are needed
+
+    Parameters
+    ----------
+        skmodel : :obj:`sklearn.neural_network.MLPRegressor`
+            Trained scikit-learn neural network
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    Raises
+    ------
+        ValueError
+            If the activation function is not supported
+
+    """
+    if skmodel.activation not in ACTIVATIONS:
+        raise ValueError('Unsupported activation function "%s"' % skmodel.activation)
+    if skmodel.out_activation_ not in ACTIVATIONS:
+        raise ValueError('Unsupported output activation "%s"' % skmodel.out_activation_)
+    # Build a DNR network model
+    net = describe.DNRNet()
+    # Add input layer
+    net.add(describe.DNRInput(input_shape=(skmodel.coefs_[0].shape[0],)))
+    # Add the hidden layers and the output layer
+    nlayers = len(skmodel.coefs_)
+    for k, (wgt, bias) in enumerate(zip(skmodel.coefs_, skmodel.intercepts_)):
+        act = skmodel.activation if k < nlayers - 1 else skmodel.out_activation_
+        net.add(describe.DNRDense(wgt, bias, ACTIVATIONS[act]))
+    # Return the network
+    return net
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from eml.net import describe
+
+
+def read_weights(weights, activations=None):
+    """ Import neural network model from raw weight arrays
+
+    Builds a fully connected network from the weight matrices and bias
+    vectors of its layers, given in the same order as returned by the
+    `get_weights` method of keras models
+
+    Parameters
+    ----------
+        weights : list(:obj:`numpy.ndarray`)
+            Alternating weight matrices (with shape inputs x units)
+            and bias vectors of the layers
+        activations : list(string)
+            Activation function of each layer, either `relu` or `linear`
+            (default `relu` for the hidden layers and `linear` for the
+            output layer)
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    Raises
+    ------
+        ValueError
+            If the number of arrays or activation functions is inconsistent
+
+    """
+    if len(weights) % 2 != 0:
+        raise ValueError('Weights and biases must be alternated')
+    nlayers = len(weights) // 2
+    if activations is None:
+        activations = ['relu'] * (nlayers - 1) + ['linear']
+    if len(activations) != nlayers:
+        raise ValueError('Inconsistent number of activation functions')
+    # Build a DNR network model
+    net = describe.DNRNet()
+    # Add input layer
+    net.add(describe.DNRInput(input_shape=(np.shape(weights[0])[0],)))
+    # Add the dense layers
+    for k in range(nlayers):
+        wgt, bias = np.asarray(weights[2 * k]), np.asarray(weights[2 * k + 1])
+        net.add(describe.DNRDense(wgt, bias, activations[k]))
+    # Return the network
+    return net
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import numpy as np
+
+from eml.net import describe
+
+# ============================================================================
+# Native on-disk format
+# ============================================================================
+
+# A network is stored as a folder with a JSON file describing the layers and
+# a npz archive with their numeric parameters (the input bounds, and weights
+# and biases of each dense layer), so that it can be loaded with NumPy only
+LAYERS_FILE = 'layers.json'
+WEIGHTS_FILE = 'weights.npz'
+FORMAT_VERSION = 1
+
+
+def save(net, path):
+    """ Save a neural network in the native format
+
+    Parameters
+    ----------
+        net : :obj:`eml.net.describe.DNRNet`
+            Neural network to be saved
+        path : string
+            Path of the output folder (created if missing)
+
+    Returns
+    -------
+        None
+
+    Raises
+    ------
+        ValueError
+            If the layer type is not supported
+
+    """
+    specs, arrays = [], {}
+    for k, layer in enumerate(net.layers()):
+        if isinstance(layer, describe.DNRInput):
+            # Original bounds are stored, i.e. not those computed by bounding
+            specs.append({'type': 'input', 'shape': list(layer._orig_lb.shape)})
+            arrays['lb_%d' % k] = layer._orig_lb
+            arrays['ub_%d' % k] = layer._orig_ub
+        elif isinstance(layer, describe.DNRDense):
+            specs.append({'type': 'dense', 'activation': layer.activation()})
+            arrays['weights_%d' % k] = layer.weights_
+            arrays['bias_%d' % k] = layer.bias_
+        else:
+            raise ValueError('Unsupported layer type')
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, WEIGHTS_FILE), 'wb') as fout:
+        np.savez(fout, **arrays)
+    with open(os.path.join(path, LAYERS_FILE), 'w') as fout:
+        json.dump({'version': FORMAT_VERSION, 'layers': specs}, fout, indent=2)
+
+
+def load(path):
+    """ Load a neural network stored in the native format
+
+    Parameters
+    ----------
+        path : string
+            Path of the folder written by :func:`save`
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            Neural Network with custom representation
+
+    Raises
+    ------
+        ValueError
+            If the format version or a layer type is not supported
+
+    """
+    with open(os.path.join(path, LAYERS_FILE)) as fin:
+        header = json.load(fin)
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError('Unsupported format version %s' % header['version'])
+    net = describe.DNRNet()
+    with np.load(os.path.join(path, WEIGHTS_FILE)) as arrays:
+        for k, spec in enumerate(header['layers']):
+            if spec['type'] == 'input':
+                layer = describe.DNRInput(input_shape=tuple(spec['shape']),
+                        lb=arrays['lb_%d' % k], ub=arrays['ub_%d' % k])
+            elif spec['type'] == 'dense':
+                layer = describe.DNRDense(arrays['weights_%d' % k],
+                        arrays['bias_%d' % k], spec['activation'])
+            else:
+                raise ValueError('Unsupported layer type "%s"' % spec['type'])
+            net.add(layer)
+    return net
+
+
+def is_native(path):
+    """ Check whether a folder contains a network in the native format
+
+    Parameters
+    ----------
+        path : string
+            Path of the folder
+
+    Returns
+    -------
+        Check result : bool
+            True if the folder contains the layer specs and the weights
+
+    """
+    return os.path.exists(os.path.join(path, LAYERS_FILE)) and \
+           os.path.exists(os.path.join(path, WEIGHTS_FILE))
+
+
+def convert_keras(model_path, path):
+    """ Convert a keras model saved on disk into the native format
+
+    This is meant to be run once, after training, so that TensorFlow is
+    not needed anymore to load the network
+
+    Parameters
+    ----------
+        model_path : string
+            Path of the keras model (e.g. a SavedModel folder)
+        path : string
+            Path of the output folder
+
+    Returns
+    -------
+        Neural Network : :obj:`eml.net.describe.DNRNet`
+            The converted network
+
+    """
+    from eml.net.reader import keras_reader
+    net = keras_reader.read_keras_file(model_path)
+    save(net, path)
+    return net
@@ -0,0 +1,125 @@
+import os
+import json
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ZONES = ['W', 'Y', 'O', 'R']
+CHANNELS = ['hosp', 'diag', 'dead']
+HEADER_FILE = 'header.json'
+SERIES_FILE = 'series.f32'
+ZONES_FILE = 'zones.i8'
+
+
+class BinaryWriter:
+    def __init__(self, path: str, days: int, channels: List[str] = CHANNELS, zones: List[str] = ZONES,
+                 overwrite: bool = False):
+        super(BinaryWriter, self).__init__()
+        # the dataset is a folder with a json header describing the layout and two raw files, i.e., the float32 series
+        # with shape (rows, days, channels) and the int8 zone codes with shape (rows, 2), both stored in row-major order
+        self.path = path
+        self.header = dict(
+            rows=0,
+            days=days,
+            channels=list(channels),
+            zones=list(zones),
+            zone_columns=['init_zone', 'actuated_zone'],
+            series_dtype='float32',
+            zones_dtype='int8'
+        )
+        os.makedirs(path, exist_ok=True)
+        if overwrite:
+            for file in [HEADER_FILE, SERIES_FILE, ZONES_FILE]:
+                if os.path.exists(os.path.join(path, file)):
+                    os.remove(os.path.join(path, file))
+        if os.path.exists(os.path.join(path, HEADER_FILE)):
+            with open(os.path.join(path, HEADER_FILE), 'r') as header_file:
+                header = json.load(header_file)
+            if header['days'] != days or header['channels'] != list(channels):
+                raise ValueError(f'Incompatible existing dataset in {path}')
+            self.header = header
+        self.codes = {zone: code for code, zone in enumerate(self.header['zones'])}
+
+    def append(self, series: np.array, init_zones: Any, actuated_zones: Any):
+        series = np.asarray(series, dtype='float32').reshape(-1, self.header['days'], len(self.header['channels']))
+        zones = np.stack((
+            pd.Series(init_zones).map(self.codes).values,
+            pd.Series(actuated_zones).map(self.codes).values
+        ), axis=1)
+        # unknown zones would be mapped to nan, which has no valid int8 representation
+        if np.any(pd.isna(zones)):
+            unknown = set(pd.Series(init_zones)).union(actuated_zones).difference(self.codes)
+            raise ValueError(f'Unknown zones {sorted(map(str, unknown))}, expected one of {list(self.codes)}')
+        zones = zones.astype('int8')
+        # rows are appended to the raw files, then the header is updated; the raw files are first truncated to the rows
+        # in the header, thus the orphan rows left by an append which was interrupted before the header update are
+        # discarded rather than being read as part of the dataset
+        row_bytes = {
+            SERIES_FILE: series.dtype.itemsize * self.header['days'] * len(self.header['channels']),
+            ZONES_FILE: zones.dtype.itemsize * 2
+        }
+        for file, size in row_bytes.items():
+            if os.path.exists(os.path.join(self.path, file)):
+                os.truncate(os.path.join(self.path, file), self.header['rows'] * size)
+        with open(os.path.join(self.path, SERIES_FILE), 'ab') as series_file:
+            series_file.write(np.ascontiguousarray(series).tobytes())
+        with open(os.path.join(self.path, ZONES_FILE), 'ab') as zones_file:
+            zones_file.write(np.ascontiguousarray(zones).tobytes())
+        self.header['rows'] += len(series)
+        # the header is replaced atomically, so that it always describes complete rows
+        with open(os.path.join(self.path, f'{HEADER_FILE}.tmp'), 'w') as header_file:
+            json.dump(self.header, header_file, indent=2)
+        os.replace(os.path.join(self.path, f'{HEADER_FILE}.tmp'), os.path.join(self.path, HEADER_FILE))
+
+    def append_frame(self, data: pd.DataFrame):
+        series = data.iloc[:, :-2].values.astype('float32')
+        self.append(series, data['init_zone'].values, data['actuated_zone'].values)
+
+
+class BinaryDataset:
+    def __init__(self, path: str):
+        super(BinaryDataset, self).__init__()
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE), 'r') as header_file:
+            self.header = json.load(header_file)
+        rows, days, channels = self.header['rows'], self.header['days'], len(self.header['channels'])
+        # arrays are memory-mapped read-only, thus no data is read until it is actually accessed
+        self.series = np.memmap(os.path.join(path, SERIES_FILE), dtype=self.header['series_dtype'], mode='r',
+                                shape=(rows, days, channels)) if rows > 0 else np.zeros((0, days, channels), 'float32')
+        self.zones = np.memmap(os.path.join(path, ZONES_FILE), dtype=self.header['zones_dtype'], mode='r',
+                               shape=(rows, 2)) if rows > 0 else np.zeros((0, 2), 'int8')
+
+    def __len__(self) -> int:
+        return self.header['rows']
+
+    @property
+    def zone_names(self) -> List[str]:
+        return self.header['zones']
+
+    @property
+    def columns(self) -> List[str]:
+        days, channels = self.header['days'], self.header['channels']
+        return [f'{c}_{d}' for d in range(days) for c in channels] + self.header['zone_columns']
+
+    def split(self, val_split: Optional[float] = 0.2, random_state: int = 0) -> tuple:
+        from sklearn.model_selection import train_test_split
+        # only indices are shuffled and split (same partition obtained by train_test_split on the whole matrix)
+        indices = np.arange(len(self))
+        if val_split is None:
+            return indices, None
+        return tuple(train_test_split(indices, test_size=val_split, shuffle=True, random_state=random_state))
+
+    def to_frame(self, indices: Any = slice(None)) -> pd.DataFrame:
+        series = np.asarray(self.series[indices], dtype='float64').reshape(-1, len(self.columns) - 2)
+        zones = np.array(self.zone_names)[self.zones[indices]]
+        df = pd.DataFrame(series, columns=self.columns[:-2])
+        df['init_zone'] = zones[:, 0]
+        df['actuated_zone'] = zones[:, 1]
+        return df
+
+
+def write_binary(data: pd.DataFrame, path: str, time_interval: Optional[int] = None) -> BinaryDataset:
+    days = (data.shape[1] - 2) // len(CHANNELS) if time_interval is None else 2 * time_interval
+    BinaryWriter(path, days=days, overwrite=True).append_frame(data)
+    return BinaryDataset(path)
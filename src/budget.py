@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+import subprocess
+from typing import Iterable, Optional
+
+# modules of the data path, which must be importable without the simulator nor the deep learning framework
+DATA_MODULES = ('dates', 'store', 'data', 'binary', 'dataset', 'cache', 'interventions')
+FORBIDDEN_MODULES = ('covasim', 'tensorflow')
+
+SCRIPT = '''
+import sys, json, time
+sys.path[:0] = {paths}
+start = time.perf_counter()
+for module in {modules}:
+    __import__(module)
+print(json.dumps(dict(time=time.perf_counter() - start, modules=sorted(sys.modules))))
+'''
+
+
+def measure_imports(modules: Iterable[str] = DATA_MODULES) -> dict:
+    # modules are imported in a fresh interpreter, so that nothing is already cached in sys.modules
+    paths = [os.path.dirname(os.path.abspath(__file__)), os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')]
+    script = SCRIPT.format(paths=repr(paths), modules=repr(list(modules)))
+    output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def check_import_budget(modules: Iterable[str] = DATA_MODULES,
+                        forbidden: Iterable[str] = FORBIDDEN_MODULES,
+                        max_time: Optional[float] = None) -> float:
+    result = measure_imports(modules)
+    imported = {m.split('.')[0] for m in result['modules'] if any(m == f or m.startswith(f'{f}.') for f in forbidden)}
+    if len(imported) > 0:
+        raise ImportError(f'Importing {", ".join(modules)} also imports {", ".join(sorted(imported))}')
+    if max_time is not None and result['time'] > max_time:
+        raise TimeoutError(f'Importing {", ".join(modules)} took {result["time"]:.2f}s (budget: {max_time:.2f}s)')
+    return result['time']
+
+
+if __name__ == '__main__':
+    elapsed = check_import_budget(max_time=float(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(f'Data path imported in {elapsed:.2f}s without {", ".join(FORBIDDEN_MODULES)}')
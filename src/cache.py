@@ -0,0 +1,120 @@
+import os
+import glob
+import json
+import hashlib
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from binary import BinaryDataset, HEADER_FILE, SERIES_FILE, ZONES_FILE
+from dataset import Scaler, process_dataset
+from store import DataStore
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'res', 'cache')
+
+
+def dataset_hash(data: Union[str, pd.DataFrame, BinaryDataset], block_size: int = 1 << 24) -> str:
+    digest = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        digest.update(json.dumps(list(map(str, data.columns))).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    else:
+        # files are hashed block by block (a binary dataset is hashed through its header and raw files), and missing
+        # files are not allowed since they would all share the same hash (remote sources must be read beforehand)
+        files = [os.path.join(data.path, f) for f in [HEADER_FILE, SERIES_FILE, ZONES_FILE]] \
+            if isinstance(data, BinaryDataset) else [data]
+        for file in files:
+            if not os.path.isfile(file):
+                raise FileNotFoundError(f'Cannot hash {file} since it is not a local file')
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, root: str = DEFAULT_ROOT, max_size: int = 512 * 2 ** 20):
+        super(FeatureCache, self).__init__()
+        self.root = root
+        self.max_size = max_size
+
+    @staticmethod
+    def key(content_hash: str, **config) -> str:
+        config = json.dumps(config, sort_keys=True)
+        return hashlib.sha1(f'{content_hash}:{config}'.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f'{key}.npz')
+
+    def get(self, key: str) -> Optional[tuple]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        # touching the file keeps track of the last usage for the eviction policy
+        os.utime(path)
+        with np.load(path) as arrays:
+            arrays = dict(arrays)
+        output = [(arrays['xt'], arrays['yt'])]
+        if 'xv' in arrays:
+            output += [(arrays['xv'], arrays['yv'])]
+        if 'x_translation' in arrays:
+            output += [tuple(
+                Scaler.from_factors(translation=arrays[f'{p}_translation'], scaling=arrays[f'{p}_scaling'])
+                for p in ['x', 'y']
+            )]
+        return tuple(output)
+
+    def put(self, key: str, output: tuple, val_split: Optional[float], scale_data: bool):
+        arrays = dict(xt=output[0][0], yt=output[0][1])
+        if val_split is not None:
+            arrays.update(xv=output[1][0], yv=output[1][1])
+        if scale_data:
+            xs, ys = output[-1]
+            arrays.update(x_translation=xs.translation, x_scaling=xs.scaling,
+                          y_translation=ys.translation, y_scaling=ys.scaling)
+        os.makedirs(self.root, exist_ok=True)
+        # write to a temporary file first so that concurrent readers never see a partial entry
+        with open(f'{self.path(key)}.tmp', 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(f'{self.path(key)}.tmp', self.path(key))
+        self.evict()
+
+    def evict(self):
+        # least recently used entries are removed until the cache fits its maximal size
+        entries = sorted(glob.glob(os.path.join(self.root, '*.npz')), key=os.path.getmtime)
+        size = sum(os.path.getsize(e) for e in entries)
+        for entry in entries[:-1]:
+            if size <= self.max_size:
+                break
+            size -= os.path.getsize(entry)
+            os.remove(entry)
+
+    def clear(self):
+        for entry in glob.glob(os.path.join(self.root, '*.npz')):
+            os.remove(entry)
+
+
+cache = FeatureCache()
+
+
+def cached_process_dataset(data: Union[str, pd.DataFrame, BinaryDataset],
+                           val_split: Optional[float] = 0.2,
+                           scale_data: bool = True,
+                           rolling_days: int = 7,
+                           random_state: int = 0,
+                           feature_cache: Optional[FeatureCache] = None) -> tuple:
+    feature_cache = cache if feature_cache is None else feature_cache
+    # remote sources are downloaded first, so that the hash depends on their actual content
+    if isinstance(data, str) and DataStore.is_remote(data):
+        data = pd.read_csv(data)
+    key = feature_cache.key(dataset_hash(data), val_split=val_split, scale_data=scale_data,
+                            rolling_days=rolling_days, random_state=random_state)
+    output = feature_cache.get(key)
+    if output is None:
+        # csv files are hashed as they are, then read only on cache misses
+        frame = pd.read_csv(data) if isinstance(data, str) else data
+        output = process_dataset(frame, val_split=val_split, scale_data=scale_data, rolling_days=rolling_days,
+                                 random_state=random_state)
+        feature_cache.put(key, output, val_split=val_split, scale_data=scale_data)
+    return output
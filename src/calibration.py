@@ -1,3 +1,8 @@
+import json
+import warnings
+import multiprocessing as mp
+from typing import Callable, Dict, List, Optional
+
 import numpy as np
 import pandas as pd
 import optuna as op
@@ -59,11 +64,196 @@ def fixed_param(trial: op.Trial, name: str, value: float = 0.) -> float:
     return trial.suggest_float(name, value, value)
 
 
+class StudyInspector:
+    def __init__(self, study: op.Study, top=0.1):
+        super(StudyInspector, self).__init__()
+        self.study = study
+        self.top = top
+        self.maximize = study.direction == op.study.StudyDirection.MAXIMIZE
+        # objective values and parameters are stored in a growing matrix (first column is the objective) and trials
+        # are read incrementally, keeping track of the ones that were still running during the previous read
+        self.columns = {'objective': 0}
+        self.data = np.empty((0, 1))
+        self.count = 0
+        self.cursor = 0
+        self.pending = set()
+
+    def _ingest(self, trial: op.trial.FrozenTrial):
+        params = {k: v for k, v in trial.params.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        for param in params:
+            self.columns.setdefault(param, len(self.columns))
+        # grow the storage geometrically (both in rows and, when new parameters appear, in columns)
+        rows, cols = self.data.shape
+        if self.count == rows or len(self.columns) > cols:
+            data = np.full((max(2 * rows, 64), len(self.columns)), np.nan)
+            data[:rows, :cols] = self.data
+            self.data = data
+        self.data[self.count, 0] = trial.value
+        for param, value in params.items():
+            self.data[self.count, self.columns[param]] = value
+        self.count += 1
+
+    def update(self) -> int:
+        trials = self.study.get_trials(deepcopy=False)
+        candidates = [trials[number] for number in sorted(self.pending)] + trials[self.cursor:]
+        self.cursor, self.pending, count = len(trials), set(), self.count
+        for trial in candidates:
+            if trial.state == op.trial.TrialState.COMPLETE:
+                # warm start trials carry objective values computed on other data, thus they are not inspected
+                if not is_warm_start(trial):
+                    self._ingest(trial)
+            elif not trial.state.is_finished():
+                self.pending.add(trial.number)
+        return self.count - count
+
+    @property
+    def results(self) -> pd.DataFrame:
+        results = pd.DataFrame(self.data[:self.count, :len(self.columns)], columns=list(self.columns))
+        return results.sort_values('objective', ascending=not self.maximize)
+
+    def top_indices(self, top=None) -> np.array:
+        top = self.top if top is None else top
+        top = top if isinstance(top, int) else int(np.ceil(top * self.count))
+        top = min(top, self.count)
+        if top == 0:
+            return np.array([], dtype=int)
+        # partial sort, then order just the top rows
+        objective = self.data[:self.count, 0] * (-1 if self.maximize else 1)
+        indices = np.argpartition(objective, top - 1)[:top] if top < self.count else np.arange(self.count)
+        return indices[np.argsort(objective[indices], kind='stable')]
+
+    def summary(self, top=None) -> pd.DataFrame:
+        data = self.data[self.top_indices(top), :len(self.columns)]
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            count = (~np.isnan(data)).sum(axis=0)
+            summary = pd.DataFrame({
+                'count': count,
+                'min': np.nanmin(data, axis=0) if len(data) > 0 else np.nan,
+                'max': np.nanmax(data, axis=0) if len(data) > 0 else np.nan,
+                'mean': np.nansum(data, axis=0) / count,
+                'median': np.nanmedian(data, axis=0) if len(data) > 0 else np.nan,
+                'std': np.nanstd(data, axis=0, ddof=1) if len(data) > 1 else np.nan
+            }, index=list(self.columns))
+        best = self.data[self.top_indices(1)[0], :len(self.columns)] if self.count > 0 else np.nan
+        return summary.assign(best=best).astype({'count': 'int'})
+
+    def inspect(self, top=None) -> tuple:
+        self.update()
+        return self.results, self.summary(top)
+
+
 def inspect_study(study, top=0.1):
-    results = pd.DataFrame([dict(objective=t.value, **t.params) for t in study.trials]).sort_values('objective')
-    top = top if isinstance(top, int) else int(np.ceil(top * len(results)))
-    summary = results.head(top).describe()
-    summary = summary.loc[['count', 'min', 'max', 'mean', '50%', 'std']].rename({'50%': 'median'})
-    summary = summary.append(pd.Series({'objective': study.best_value, **study.best_params}, name='best'))
-    summary = summary.transpose().astype({'count': 'int'})
-    return results, summary
+    return StudyInspector(study, top=top).inspect()
+
+
+def load_parameters(filepath: str = '../res/parameters.json') -> Dict[str, float]:
+    with open(filepath, 'r') as json_file:
+        j = json.load(json_file)
+    # merge initial and intervention parameters, keeping only the numeric ones (i.e., the calibrated ones)
+    parameters = {**j['initial_params'], **j['intervention_params']}
+    return {k: v for k, v in parameters.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+def is_warm_start(trial: op.trial.FrozenTrial) -> bool:
+    return trial.user_attrs.get('warm_start', False)
+
+
+def get_top_trials(study: op.Study, top=10) -> List[op.trial.FrozenTrial]:
+    # warm start trials are ignored, since their objective values were not computed on the data of the study
+    trials = study.get_trials(deepcopy=False, states=(op.trial.TrialState.COMPLETE,))
+    trials = [trial for trial in trials if not is_warm_start(trial)]
+    trials = sorted(trials, key=lambda t: t.value, reverse=study.direction == op.study.StudyDirection.MAXIMIZE)
+    top = top if isinstance(top, int) else int(np.ceil(top * len(trials)))
+    return trials[:top]
+
+
+def get_best_trial(study: op.Study) -> op.trial.FrozenTrial:
+    # to be used in place of study.best_trial (and best_params/best_value) on warm started studies
+    trials = get_top_trials(study, top=1)
+    if len(trials) == 0:
+        raise ValueError('The study has no completed trials other than the warm start ones')
+    return trials[0]
+
+
+def warm_start(study: op.Study,
+               parameters: Optional[Dict[str, float]] = None,
+               prior_study: Optional[op.Study] = None,
+               top=10,
+               fit_prior: bool = False) -> op.Study:
+    # the stored parameters are evaluated first, then the best trials of the prior study (parameters which are not
+    # part of the search space are ignored by optuna, while the missing ones are sampled as usual)
+    if parameters is not None:
+        study.enqueue_trial(parameters)
+    if prior_study is not None:
+        trials = get_top_trials(prior_study, top=top)
+        for trial in trials:
+            study.enqueue_trial(trial.params)
+        # the top trials are also added as completed trials so that the sampler models them from the very beginning
+        # instead of running its random startup trials; their objective values come from the prior study, thus they
+        # are tagged in order to be distinguishable from the ones evaluated on the new data (study.best_trial still
+        # considers them, while get_best_trial, get_top_trials and StudyInspector skip them)
+        if fit_prior:
+            for trial in trials:
+                study.add_trial(op.trial.create_trial(
+                    state=op.trial.TrialState.COMPLETE,
+                    value=trial.value,
+                    params=trial.params,
+                    distributions=trial.distributions,
+                    user_attrs={**trial.user_attrs, 'warm_start': True}
+                ))
+    return study
+
+
+def mean_mismatch(trial: op.Trial, sims: list, **fit_kwargs) -> float:
+    return float(np.mean([s.compute_fit(**fit_kwargs).mismatch for s in sims]))
+
+
+def optimize_batched(study: op.Study,
+                     get_sim: Callable,
+                     get_loss: Callable = mean_mismatch,
+                     n_trials: int = 100,
+                     batch_size: Optional[int] = None,
+                     n_runs: int = 3,
+                     n_cpus: Optional[int] = None) -> op.Study:
+    import covasim as cv
+    import sciris as sc
+    n_cpus = mp.cpu_count() if n_cpus is None else n_cpus
+    # by default, a batch has enough trials to keep all the cores busy with its replicates
+    batch_size = int(np.ceil(n_cpus / n_runs)) if batch_size is None else batch_size
+    completed = 0
+    while completed < n_trials:
+        trials, sims, size = [], [], min(batch_size, n_trials - completed)
+        for _ in range(size):
+            trial = study.ask()
+            try:
+                sim = get_sim(trial)
+            except Exception:
+                study.tell(trial, state=op.trial.TrialState.FAIL)
+                continue
+            # replicates are reseeded as in covasim's multi runs (i.e., incrementing the seed by the run index)
+            for run in range(n_runs):
+                replicate = sc.dcp(sim)
+                replicate['rand_seed'] += run
+                sims.append(replicate)
+            trials.append(trial)
+        completed += size
+        if len(trials) == 0:
+            continue
+        # all the simulations of the batch are run as a single parallel job, then grouped back by trial; failures are
+        # handled as the ones of get_sim, i.e., the involved trials are marked as failed rather than left running
+        try:
+            msim = cv.MultiSim(sims)
+            msim.run(n_cpus=n_cpus, keep_people=False)
+        except Exception:
+            for trial in trials:
+                study.tell(trial, state=op.trial.TrialState.FAIL)
+            continue
+        for idx, trial in enumerate(trials):
+            try:
+                loss = get_loss(trial, msim.sims[idx * n_runs:(idx + 1) * n_runs])
+            except Exception:
+                study.tell(trial, state=op.trial.TrialState.FAIL)
+                continue
+            study.tell(trial, loss)
+    return study
@@ -1,23 +1,104 @@
-from typing import Any, List
+import itertools
+from abc import ABC, abstractmethod
+from typing import Any, Iterator, List
+
+
+class LazySequence(ABC):
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def get(self, idx: int) -> Any:
+        pass
+
+    def __getitem__(self, idx: Any) -> Any:
+        if isinstance(idx, slice):
+            return LazySlice(self, range(len(self))[idx])
+        idx = idx + len(self) if idx < 0 else idx
+        if not 0 <= idx < len(self):
+            raise IndexError(f'index {idx} is out of range')
+        return self.get(idx)
+
+    def __iter__(self) -> Iterator:
+        return (self.get(idx) for idx in range(len(self)))
+
+    def shard(self, i: int, n: int) -> 'LazySlice':
+        # the i-th of n contiguous and disjoint slices, whose sizes differ at most by one
+        if n < 1 or not 0 <= i < n:
+            raise ValueError(f'Invalid shard {i} of {n}, the number of shards must be positive and the index in [0, n)')
+        size, rest = divmod(len(self), n)
+        start = i * size + min(i, rest)
+        return LazySlice(self, range(start, start + size + (1 if i < rest else 0)))
+
+
+class LazySlice(LazySequence):
+    def __init__(self, sequence: LazySequence, indices: range):
+        super(LazySlice, self).__init__()
+        self.sequence = sequence
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def get(self, idx: int) -> Any:
+        return self.sequence.get(self.indices[idx])
+
+
+class CartesianProduct(LazySequence):
+    def __init__(self, fixed_parameters: dict = None, **kwargs: Any):
+        super(CartesianProduct, self).__init__()
+        self.fixed_parameters = {} if fixed_parameters is None else fixed_parameters
+        # the last parameter varies slowest and comes first in the dictionaries, as in the original recursive version
+        self.parameters = list(kwargs.keys())[::-1]
+        self.values = [list(kwargs[parameter]) for parameter in self.parameters]
+
+    def __len__(self) -> int:
+        size = 1
+        for values in self.values:
+            size *= len(values)
+        return size
+
+    def __iter__(self) -> Iterator[dict]:
+        for combination in itertools.product(*self.values):
+            yield {**self.fixed_parameters, **dict(zip(self.parameters, combination))}
+
+    def get(self, idx: int) -> dict:
+        # mixed-radix decoding of the index, the first parameter being the most significant digit
+        combination = []
+        for values in self.values[::-1]:
+            idx, digit = divmod(idx, len(values))
+            combination.append(values[digit])
+        return {**self.fixed_parameters, **dict(zip(self.parameters, combination[::-1]))}
+
+
+class IncrementalLevels(LazySequence):
+    def __init__(self, num_levels: int, parameters: List[Any]):
+        super(IncrementalLevels, self).__init__()
+        # configurations with 0, 1, ..., num_levels levels, each level taking one of the given parameters
+        self.parameters = list(parameters)
+        self.levels = [CartesianProduct(**{str(level): self.parameters for level in range(levels)})
+                       for levels in range(num_levels + 1)]
+
+    def __len__(self) -> int:
+        return sum(len(level) for level in self.levels)
+
+    def __iter__(self) -> Iterator[tuple]:
+        for level in self.levels:
+            for h in level:
+                yield tuple(h.values())
+
+    def get(self, idx: int) -> tuple:
+        for level in self.levels:
+            if idx < len(level):
+                return tuple(level.get(idx).values())
+            idx -= len(level)
+        raise IndexError(f'index {idx} is out of range')
 
 
 def cartesian_product(fixed_parameters: dict = None, **kwargs: Any) -> List[dict]:
-    fixed_parameters = {} if fixed_parameters is None else fixed_parameters
-    if len(kwargs) == 0:
-        return [fixed_parameters]
-    else:
-        cart_product = []
-        parameter, values = kwargs.popitem()
-        for value in values:
-            new_parameters = {**fixed_parameters, parameter: value}
-            sub_product = cartesian_product(fixed_parameters=new_parameters, **kwargs)
-            cart_product.append(sub_product)
-        return [parameters for sub_product in cart_product for parameters in sub_product]
+    return list(CartesianProduct(fixed_parameters=fixed_parameters, **kwargs))
 
 
 def incremental_levels(num_levels, parameters):
-    outputs = [{}]
-    for levels in range(num_levels):
-        outputs += cartesian_product(**{str(level): parameters for level in range(levels + 1)})
-    outputs = [tuple(h.values()) for h in outputs]
-    return outputs
+    return list(IncrementalLevels(num_levels=num_levels, parameters=parameters))
@@ -1,49 +1,244 @@
+from typing import Dict, Optional, Union
 import numpy as np
 import pandas as pd
 
-from interventions import get_delta
+from store import DataStore
 
 URL = 'https://raw.githubusercontent.com/pcm-dpc/COVID-19/master/dati-regioni/dpc-covid19-ita-regioni.csv'
+COLUMNS = {
+    'data': 'date',
+    'denominazione_regione': 'region',
+    'ricoverati_con_sintomi': 'n_severe',
+    'terapia_intensiva': 'n_critical',
+    'totale_casi': 'cum_diagnoses',
+    'deceduti': 'cum_deaths',
+    'tamponi': 'new_tests'
+}
+DTYPES = {
+    'data': 'str',
+    'denominazione_regione': 'category',
+    'ricoverati_con_sintomi': 'float64',
+    'terapia_intensiva': 'float64',
+    'totale_casi': 'float64',
+    'deceduti': 'float64',
+    'tamponi': 'float64'
+}
 
+store = DataStore()
 
-def get_regional_data(scaling_factor: float = 1, region: str = 'Emilia-Romagna') -> pd.DataFrame:
-    df = pd.read_csv(URL)
-    # extract data of a single region
-    df = df[df['denominazione_regione'] == region]
-    # reindex using date
-    df.index = pd.Series([pd.to_datetime(d).date() for d in df['data']], name='date')
-    # keep just some columns and rename them
-    df = df[['ricoverati_con_sintomi', 'terapia_intensiva', 'totale_casi', 'deceduti', 'tamponi']]
-    df.columns = ['n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths', 'new_tests']
-    # compute daily tests from cumulative value
-    df['new_tests'] = [t2 - t1 for t1, t2 in zip([0] + list(df['new_tests'][:-1]), df['new_tests'])]
+
+def parse_regional_rows(df: pd.DataFrame) -> pd.DataFrame:
+    # rename the columns, then parse dates at once (the time part is discarded) and index by region and date
+    df = df[list(COLUMNS)].rename(columns=COLUMNS)
+    df['date'] = pd.to_datetime(df['date'].str[:10], format='%Y-%m-%d')
+    df = df.set_index(['region', 'date']).sort_index()
+    return df[['n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths', 'new_tests']]
+
+
+def read_regional_panel(source: str = URL) -> pd.DataFrame:
+    # read just the needed columns with explicit types
+    df = parse_regional_rows(pd.read_csv(source, usecols=list(COLUMNS), dtype=DTYPES))
+    # compute daily tests from cumulative value, region by region (the first day keeps the cumulative value)
+    tests = df['new_tests'].values
+    first = np.r_[True, df.index.codes[0][1:] != df.index.codes[0][:-1]]
+    df['new_tests'] = np.where(first, tests, tests - np.r_[0., tests[:-1]])
+    return df
+
+
+def get_regional_panel(scaling_factor: float = 1,
+                       source: str = URL,
+                       offline: bool = False,
+                       max_age: Optional[int] = 1) -> pd.DataFrame:
+    df = store.load(source, name='panel', offline=offline, max_age=max_age, reader=read_regional_panel)
     # rescaling according to given factor
-    df = (df / scaling_factor).clip(lower=0.0)
-    # reset index to get date as a column
+    return (df / scaling_factor).clip(lower=0.0)
+
+
+def get_regional_data(scaling_factor: float = 1,
+                      region: str = 'Emilia-Romagna',
+                      source: str = URL,
+                      offline: bool = False,
+                      max_age: Optional[int] = 1) -> pd.DataFrame:
+    df = store.load(source, name='panel', offline=offline, max_age=max_age, reader=read_regional_panel)
+    # extract data of a single region, rescaling according to given factor
+    df = (df.loc[region] / scaling_factor).clip(lower=0.0)
+    # reset index to get date as a column (dates are returned as python dates)
+    df.index = pd.Index(df.index.date, name='date')
     return df.reset_index()
 
 
-def get_real_samples(region: str, zones: dict, scaling_factor: float = 1, time_interval: int = 21) -> pd.DataFrame:
-    zones = [
-        (range(get_delta(d) - time_interval - 1, get_delta(d) + time_interval), z)
-        for d, z in zones.items()
-    ]
-
-    samples = {
-        days: (init_zone, actuated_zone)
-        for (_, init_zone), (days, actuated_zone) in zip([(range(0), 'W')] + zones[:-2], zones[:-1])
-    }
-
-    df = get_regional_data(scaling_factor, region)
-    real_data = []
-    for period, zones in samples.items():
-        temp = df.iloc[period]
-        row = np.concatenate((
-            temp['n_severe'].values[1:] + temp['n_critical'].values[1:],
-            temp['cum_diagnoses'].values[1:] - temp['cum_diagnoses'].values[:-1],
-            temp['cum_deaths'].values[1:] - temp['cum_deaths'].values[:-1]
-        )).reshape(3, -1).transpose().flatten()
-        real_data.append(list(row) + list(zones))
+def sliding_windows(values: np.array, window: int, axis: int = 0) -> np.array:
+    # the windows dimension is appended as last axis, as in numpy's sliding_window_view (which is used if available)
+    if hasattr(np.lib.stride_tricks, 'sliding_window_view'):
+        return np.lib.stride_tricks.sliding_window_view(values, window, axis=axis)
+    shape = list(values.shape)
+    shape[axis] -= window - 1
+    return np.lib.stride_tricks.as_strided(
+        values,
+        shape=tuple(shape) + (window,),
+        strides=values.strides + (values.strides[axis],),
+        writeable=False
+    )
+
+
+def get_zones_samples(zones: Dict[str, dict],
+                      scaling_factor: Union[float, Dict[str, float]] = 1,
+                      time_interval: int = 21,
+                      **kwargs) -> pd.DataFrame:
+    regions = list(zones.keys())
+    panel = get_regional_panel(scaling_factor=1, **kwargs)
+    dates = panel.index.levels[1]
+    # build a (regions, days, channels) array from the panel, rescaling each region according to its factor
+    panel = panel.reindex(pd.MultiIndex.from_product([regions, dates]))
+    values = panel[['n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths']].values
+    values = values.reshape(len(regions), len(dates), -1)
+    factors = [scaling_factor.get(r, 1) if isinstance(scaling_factor, dict) else scaling_factor for r in regions]
+    values = (values / np.reshape(factors, (-1, 1, 1))).clip(min=0.0)
+    series = np.stack((
+        values[:, :, 0] + values[:, :, 1],
+        np.pad(np.diff(values[:, :, 2], axis=1), ((0, 0), (1, 0)), constant_values=np.nan),
+        np.pad(np.diff(values[:, :, 3], axis=1), ((0, 0), (1, 0)), constant_values=np.nan)
+    ), axis=-1)
+    # each sample takes the time_interval days before the zone change and the time_interval days after, with the
+    # zone of the previous change as initial zone (the first one being white) and the last change only used for that
+    region_indices, starts, init_zones, actuated_zones = [], [], [], []
+    for idx, region_zones in enumerate(zones.values()):
+        offsets = (pd.to_datetime(list(region_zones.keys())) - dates[0]).days.values[:-1]
+        colors = list(region_zones.values())
+        region_indices += [idx] * len(offsets)
+        starts += list(offsets - time_interval)
+        init_zones += (['W'] + colors[:-2])[:len(offsets)]
+        actuated_zones += colors[:-1]
+    starts = np.array(starts, dtype=int)
+    if np.any(starts < 1) or np.any(starts + 2 * time_interval > len(dates)):
+        raise ValueError('Zone changes must leave time_interval days of data before and after them')
+    # extract all the windows at once, then interleave the channels to get the (hosp, diag, dead) layout
+    windows = sliding_windows(series, 2 * time_interval, axis=1)[np.array(region_indices, dtype=int), starts]
+    windows = windows.transpose(0, 2, 1).reshape(len(starts), -1)
     columns = [f'{c}_{d}' for d in range(0, 2 * time_interval) for c in ['hosp', 'diag', 'dead']]
-    columns += ['init_zone', 'actuated_zone']
-    return pd.DataFrame(real_data, columns=columns)
+    df = pd.DataFrame(windows, columns=columns, index=pd.Index(np.array(regions)[region_indices], name='region'))
+    df['init_zone'] = init_zones
+    df['actuated_zone'] = actuated_zones
+    return df
+
+
+def get_real_samples(region: str,
+                     zones: dict,
+                     scaling_factor: float = 1,
+                     time_interval: int = 21,
+                     **kwargs) -> pd.DataFrame:
+    df = get_zones_samples({region: zones}, scaling_factor=scaling_factor, time_interval=time_interval, **kwargs)
+    return df.reset_index(drop=True)
+
+
+class RegionalPanel:
+    def __init__(self,
+                 panel: pd.DataFrame,
+                 scaling_factor: Union[float, Dict[str, float]] = 1,
+                 time_interval: int = 21):
+        super(RegionalPanel, self).__init__()
+        # the panel is the unscaled output of read_regional_panel, and it is stored as (regions, days, columns) arrays
+        # whose days dimension has some spare capacity so that new days can be appended without copying the history
+        self.regions = list(panel.index.get_level_values(0).unique())
+        self.dates = pd.DatetimeIndex([])
+        self.factors = np.array([
+            scaling_factor.get(r, 1) if isinstance(scaling_factor, dict) else scaling_factor for r in self.regions
+        ]).reshape(-1, 1)
+        self.time_interval = time_interval
+        self.length = 0
+        self.cum_tests = np.zeros((len(self.regions), 0))
+        self.data = np.zeros((len(self.regions), 0, 5))
+        self.series = np.zeros((len(self.regions), 0, 3))
+        # registered samples (keyed by region and zone change date), cached rows and keys of the stale ones
+        self.windows = {}
+        self.rows = {}
+        self.stale = set()
+        dates = pd.DatetimeIndex(panel.index.get_level_values(1).unique().sort_values())
+        values = panel.reindex(pd.MultiIndex.from_product([self.regions, dates])).values
+        values = values.reshape(len(self.regions), len(dates), -1)
+        values[:, :, 4] = np.cumsum(values[:, :, 4], axis=1)
+        self._extend(dates, values)
+
+    @classmethod
+    def load(cls, scaling_factor: Union[float, Dict[str, float]] = 1, time_interval: int = 21, source: str = URL,
+             offline: bool = False, max_age: Optional[int] = 1):
+        panel = store.load(source, name='panel', offline=offline, max_age=max_age, reader=read_regional_panel)
+        return cls(panel, scaling_factor=scaling_factor, time_interval=time_interval)
+
+    def _reserve(self, days: int):
+        capacity = self.data.shape[1]
+        if self.length + days > capacity:
+            capacity = max(2 * capacity, self.length + days, 64)
+            for name in ['cum_tests', 'data', 'series']:
+                old = getattr(self, name)
+                new = np.full((old.shape[0], capacity) + old.shape[2:], np.nan)
+                new[:, :self.length] = old[:, :self.length]
+                setattr(self, name, new)
+
+    def _extend(self, dates: pd.DatetimeIndex, values: np.array) -> set:
+        # values are unscaled and cumulative (tests included), thus only the new days are rescaled and differenced
+        old, new = self.length, self.length + len(dates)
+        self._reserve(len(dates))
+        self.cum_tests[:, old:new] = values[:, :, 4]
+        data = values / self.factors[:, :, None]
+        previous = self.cum_tests[:, old - 1:old] if old > 0 else np.zeros((len(self.regions), 1))
+        data[:, :, 4] = np.diff(np.concatenate((previous, values[:, :, 4]), axis=1), axis=1) / self.factors
+        self.data[:, old:new] = data.clip(min=0.0)
+        # differences are computed with respect to the last stored day (the first day of all is undefined)
+        previous = self.data[:, old - 1:old, 2:4] if old > 0 else np.full((len(self.regions), 1, 2), np.nan)
+        differences = np.diff(np.concatenate((previous, self.data[:, old:new, 2:4]), axis=1), axis=1)
+        self.series[:, old:new, 0] = self.data[:, old:new, 0] + self.data[:, old:new, 1]
+        self.series[:, old:new, 1:] = differences
+        self.dates = self.dates.append(dates)
+        self.length = new
+        # only the windows which were not complete before may be affected by the new days
+        affected = {key for key, (_, start, _, _) in self.windows.items() if start + 2 * self.time_interval > old}
+        self.stale |= affected
+        return affected
+
+    def append(self, rows: pd.DataFrame) -> set:
+        # rows are in the original format, and only the ones after the last stored date are considered
+        rows = parse_regional_rows(rows)
+        rows = rows[rows.index.get_level_values(1) > self.dates[-1]]
+        dates = pd.DatetimeIndex(rows.index.get_level_values(1).unique().sort_values())
+        if len(dates) == 0:
+            return set()
+        # days must be contiguous, so that positions and dates stay aligned
+        expected = pd.date_range(self.dates[-1] + pd.DateOffset(days=1), dates[-1])
+        values = rows.reindex(pd.MultiIndex.from_product([self.regions, expected])).values
+        return self._extend(expected, values.reshape(len(self.regions), len(expected), -1))
+
+    def region_data(self, region: str) -> pd.DataFrame:
+        data = self.data[self.regions.index(region), :self.length]
+        df = pd.DataFrame(data, columns=['n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths', 'new_tests'])
+        df.insert(0, 'date', self.dates.date)
+        return df
+
+    def register_zones(self, region: str, zones: dict):
+        dates = list(zones.keys())
+        colors = list(zones.values())
+        offsets = (pd.to_datetime(dates) - self.dates[0]).days.values
+        # same sampling strategy and bounds as get_zones_samples, except that windows which end after the last stored
+        # day are kept pending until the data is appended
+        if np.any(offsets[:-1] - self.time_interval < 1):
+            raise ValueError('Zone changes must leave time_interval days of data before and after them')
+        for date, offset, init_zone, actuated_zone in zip(dates[:-1], offsets[:-1], ['W'] + colors[:-2], colors[:-1]):
+            key = (region, date)
+            self.windows[key] = (self.regions.index(region), offset - self.time_interval, init_zone, actuated_zone)
+            self.rows.pop(key, None)
+            self.stale.add(key)
+
+    def samples(self) -> pd.DataFrame:
+        # recompute just the stale windows which are complete, the other ones are served from the cache
+        for key in list(self.stale):
+            idx, start, _, _ = self.windows[key]
+            if start + 2 * self.time_interval <= self.length:
+                self.rows[key] = self.series[idx, start:start + 2 * self.time_interval].flatten()
+                self.stale.remove(key)
+        keys = [key for key in self.windows if key in self.rows]
+        columns = [f'{c}_{d}' for d in range(0, 2 * self.time_interval) for c in ['hosp', 'diag', 'dead']]
+        df = pd.DataFrame([self.rows[key] for key in keys], columns=columns,
+                          index=pd.Index([region for region, _ in keys], name='region'))
+        df['init_zone'] = [self.windows[key][2] for key in keys]
+        df['actuated_zone'] = [self.windows[key][3] for key in keys]
+        return df
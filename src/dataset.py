@@ -1,7 +1,11 @@
-from typing import Optional, Any
+import warnings
+import queue
+import threading
+from typing import Optional, Any, Iterator, List, Union
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+
+from binary import BinaryDataset
 
 one_hot_zones = {
     'W': [1, 0, 0, 0],
@@ -11,39 +15,87 @@ one_hot_zones = {
 }
 
 
-def process_dataset(data: pd.DataFrame, val_split: Optional[float] = 0.2, scale_data: bool = True,
-                    rolling_days: int = 7) -> tuple:
-    def process_series(series: pd.Series):
-        # retrieve initial and actuated zone and map to one hot vector
-        init_zone = one_hot_zones[series['init_zone']]
-        actuated_zone = one_hot_zones[series['actuated_zone']]
-        # get input and output data (first half of the series and second half of the series)
-        df = pd.DataFrame(series.values[:-2].reshape(-1, 3).astype('float'), columns=['hosp', 'diag', 'dead'])
-        output_df = df.tail(len(df) // 2).copy()
-        input_df = df.head(len(df) // 2).copy()
-        # perform rolling average on each column then return the last two weeks of data with the zones as features
-        input_df = input_df.rolling(rolling_days).mean()
-        input_vector = list(input_df.iloc[rolling_days - 1:].values.transpose().flatten()) + init_zone + actuated_zone
-        # return the peak of hospitalized and the number of dead and diagnosed individuals in the second half period
-        output_vector = [output_df['hosp'].max(), output_df['diag'].sum(), output_df['dead'].sum()]
-        return input_vector, output_vector
+SCALING_METHODS = ['std', 'standardize', 'norm', 'normalize', 'minmax', 'zero', 'max', 'zeromax']
+
+zone_codes = {zone: code for code, zone in enumerate(one_hot_zones.keys())}
+one_hot_table = np.array(list(one_hot_zones.values()))
+
+
+def rolling_mean(values: np.array, window: int, axis: int = 1) -> np.array:
+    # rolling mean computed via cumulative sums (windows containing nan values are nan, as in pandas)
+    values = np.moveaxis(values, axis, -1)
+    nans = np.isnan(values)
+    sums = np.cumsum(np.where(nans, 0., values), axis=-1)
+    sums = np.concatenate((np.zeros_like(sums[..., :1]), sums), axis=-1)
+    counts = np.cumsum(nans, axis=-1)
+    counts = np.concatenate((np.zeros_like(counts[..., :1]), counts), axis=-1)
+    means = (sums[..., window:] - sums[..., :-window]) / window
+    means[counts[..., window:] - counts[..., :-window] > 0] = np.nan
+    return np.moveaxis(means, -1, axis)
+
+
+def get_zone_codes(zones: Any) -> np.array:
+    # zones can be passed either as letters or as (integer) zone codes
+    zones = np.asarray(zones)
+    return zones if zones.dtype.kind in 'iu' else pd.Series(zones).map(zone_codes).values
+
+
+def featurize(series: np.array, init_zones: Any, actuated_zones: Any, rolling_days: int = 7) -> tuple:
+    # series has shape (n_rows, days, 3), with channels hosp, diag and dead
+    half = series.shape[1] // 2
+    inputs, outputs = series[:, :half], series[:, series.shape[1] - half:]
+    # perform rolling average on each column then return the last two weeks of data with the zones as features
+    # (flattened column by column), the initial and actuated zone being mapped to one hot vectors
+    inputs = rolling_mean(inputs, window=rolling_days, axis=1).transpose(0, 2, 1).reshape(len(series), -1)
+    init_zones = one_hot_table[get_zone_codes(init_zones)]
+    actuated_zones = one_hot_table[get_zone_codes(actuated_zones)]
+    x = np.concatenate((inputs, init_zones, actuated_zones), axis=1)
+    # return the peak of hospitalized and the number of dead and diagnosed individuals in the second half period
+    y = np.stack((outputs[:, :, 0].max(axis=1), outputs[:, :, 1].sum(axis=1), outputs[:, :, 2].sum(axis=1)), axis=1)
+    return x, y
+
 
+def featurize_chunks(data: Union[pd.DataFrame, BinaryDataset], rolling_days: int = 7, chunk_size: int = 65536,
+                     indices: Optional[np.array] = None) -> Iterator[tuple]:
+    indices = np.arange(len(data)) if indices is None else np.asarray(indices)
+    for i in range(0, len(indices), chunk_size):
+        # contiguous chunks are read as slices (i.e., views on memory-mapped data), the other ones with fancy indexing
+        chunk = indices[i:i + chunk_size]
+        if len(chunk) > 0 and np.all(np.diff(chunk) == 1):
+            chunk = slice(chunk[0], chunk[-1] + 1)
+        if isinstance(data, BinaryDataset):
+            # memory-mapped series are cast just one chunk at a time
+            lookup = np.array([zone_codes[zone] for zone in data.zone_names])
+            yield featurize(
+                series=np.asarray(data.series[chunk], dtype='float'),
+                init_zones=lookup[data.zones[chunk, 0]],
+                actuated_zones=lookup[data.zones[chunk, 1]],
+                rolling_days=rolling_days
+            )
+        else:
+            rows = data.iloc[chunk]
+            series = rows.iloc[:, :-2].values.astype('float').reshape(len(rows), -1, 3)
+            yield featurize(series, rows['init_zone'].values, rows['actuated_zone'].values, rolling_days=rolling_days)
+
+
+def process_dataset(data: Union[pd.DataFrame, BinaryDataset], val_split: Optional[float] = 0.2,
+                    scale_data: bool = True, rolling_days: int = 7, chunk_size: int = 65536,
+                    random_state: int = 0) -> tuple:
     def get_scalers(xx: np.array, yy: np.array):
         x_scaler = Scaler(data=xx, methods={idx: 'std' if idx < 45 else None for idx in range(len(xx))})
         y_scaler = Scaler(data=yy, methods='minmax')
         return x_scaler, y_scaler
 
-    x, y = [], []
-    for _, s in data.iterrows():
-        inputs, outputs = process_series(s)
-        x.append(inputs)
-        y.append(outputs)
-    x, y = np.array(x), np.array(y)
+    chunks = list(featurize_chunks(data, rolling_days=rolling_days, chunk_size=chunk_size))
+    x, y = np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
 
+    # split by index (which leads to the same partition as splitting the whole matrices)
     if val_split is None:
         xt, xv, yt, yv = x, None, y, None
     else:
-        xt, xv, yt, yv = train_test_split(x, y, test_size=val_split, shuffle=True, random_state=0)
+        from sklearn.model_selection import train_test_split
+        train, val = train_test_split(np.arange(len(x)), test_size=val_split, shuffle=True, random_state=random_state)
+        xt, xv, yt, yv = x[train], x[val], y[train], y[val]
 
     xs, ys = None, None
     if scale_data:
@@ -60,40 +112,243 @@ def process_dataset(data: pd.DataFrame, val_split: Optional[float] = 0.2, scale_
     return tuple(output)
 
 
+def prefetch(iterator: Iterator, size: int = 2) -> Iterator:
+    # items are produced by a background thread (numpy releases the gil, thus featurization overlaps with training)
+    items, done, stop = queue.Queue(maxsize=size), object(), threading.Event()
+
+    def put(item) -> bool:
+        # the producer waits for free slots as long as the consumer is alive, i.e., it did not stop iterating
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+        except Exception as exception:
+            put((None, exception))
+            return
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+        put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, exception = items.get()
+            if exception is not None:
+                raise exception
+            if item is done:
+                return
+            yield item
+    finally:
+        # when the consumer stops early (or the generator is garbage collected) the producer is released
+        stop.set()
+
+
+def iterate_batches(data: Union[pd.DataFrame, BinaryDataset, List[Union[pd.DataFrame, BinaryDataset]]],
+                    scalers: Optional[tuple] = None,
+                    batch_size: int = 32,
+                    indices: Optional[np.array] = None,
+                    shuffle: bool = True,
+                    seed: Optional[int] = None,
+                    rolling_days: int = 7,
+                    chunk_size: int = 65536,
+                    prefetch_size: int = 2) -> Iterator[tuple]:
+    # data can be a single source or a list of shards (indices, if given, refer to a single source)
+    shards = data if isinstance(data, list) else [data]
+    rng = np.random.default_rng(seed)
+
+    def batches():
+        for shard in (rng.permutation(len(shards)) if shuffle else range(len(shards))):
+            shard_indices = np.arange(len(shards[shard])) if indices is None else np.sort(indices)
+            # shuffling is performed on the order of chunks and then within each chunk, so that reads stay sequential
+            starts = np.arange(0, len(shard_indices), chunk_size)
+            for start in (rng.permutation(starts) if shuffle else starts):
+                chunk = shard_indices[start:start + chunk_size]
+                x, y = next(featurize_chunks(shards[shard], rolling_days=rolling_days, chunk_size=len(chunk),
+                                             indices=chunk))
+                if scalers is not None:
+                    x, y = scalers[0].transform(x), scalers[1].transform(y)
+                order = rng.permutation(len(x)) if shuffle else np.arange(len(x))
+                for i in range(0, len(x), batch_size):
+                    yield x[order[i:i + batch_size]], y[order[i:i + batch_size]]
+
+    return batches() if prefetch_size == 0 else prefetch(batches(), size=prefetch_size)
+
+
+def fit_scalers(data: Union[pd.DataFrame, BinaryDataset, List[Union[pd.DataFrame, BinaryDataset]]],
+                indices: Optional[np.array] = None,
+                rolling_days: int = 7,
+                chunk_size: int = 65536) -> tuple:
+    # streaming version of the scalers fitted in process_dataset (series features are standardized, zones are not)
+    x_scaler, y_scaler = None, Scaler(methods='minmax')
+    for shard in (data if isinstance(data, list) else [data]):
+        for x, y in featurize_chunks(shard, rolling_days=rolling_days, chunk_size=chunk_size, indices=indices):
+            if x_scaler is None:
+                x_scaler = Scaler(methods={idx: 'std' if idx < x.shape[1] - 8 else None for idx in range(x.shape[1])})
+            x_scaler.partial_fit(x)
+            y_scaler.partial_fit(y)
+    return x_scaler, y_scaler
+
+
+def as_tf_dataset(data: Union[pd.DataFrame, BinaryDataset, List[Union[pd.DataFrame, BinaryDataset]]],
+                  scalers: Optional[tuple] = None,
+                  batch_size: int = 32,
+                  **kwargs):
+    import tensorflow as tf
+    # the number of features is retrieved by featurizing the first row
+    sample = data[0] if isinstance(data, list) else data
+    x, y = next(featurize_chunks(sample, rolling_days=kwargs.get('rolling_days', 7), chunk_size=1))
+    # the generator is rebuilt at each epoch, thus each epoch gets its own seed (derived from the given one) in order
+    # to change the shuffling order while keeping the whole sequence reproducible
+    seeds = np.random.SeedSequence(kwargs.pop('seed', None))
+    return tf.data.Dataset.from_generator(
+        lambda: iterate_batches(data, scalers=scalers, batch_size=batch_size,
+                                seed=int(seeds.spawn(1)[0].generate_state(1)[0]), **kwargs),
+        output_signature=(
+            tf.TensorSpec(shape=(None, x.shape[1]), dtype=tf.float64),
+            tf.TensorSpec(shape=(None, y.shape[1]), dtype=tf.float64)
+        )
+    ).prefetch(tf.data.experimental.AUTOTUNE)
+
+
 class Scaler:
-    def __init__(self, data: Any, methods: Any = 'std'):
+    def __init__(self, data: Any = None, methods: Any = 'std'):
         super(Scaler, self).__init__()
+        self.methods = methods
+        self.translation = None
+        self.scaling = None
+        # running statistics (count, mean, sum of squared deviations, minimum and maximum) used by partial_fit
+        self.stats = None
+        if data is not None:
+            self.fit(data)
+
+    @staticmethod
+    def _values(data: Any) -> tuple:
         # handle non-pandas data
         if not isinstance(data, pd.DataFrame):
             data = pd.DataFrame(np.array(data))
+        return data.columns, data.values.astype('float')
+
+    def _column_methods(self, columns: Any) -> list:
         # handle all-the-same methods
-        if not isinstance(methods, dict):
-            methods = {column: methods for column in data.columns}
+        methods = self.methods if isinstance(self.methods, dict) else {column: self.methods for column in columns}
+        methods = [methods.get(column) for column in columns]
+        unsupported = [m for m in methods if m is not None and not isinstance(m, tuple) and m not in SCALING_METHODS]
+        if len(unsupported) > 0:
+            raise ValueError(f'Method {unsupported[0]} is not supported')
+        return methods
+
+    def _set_factors(self, methods: list, mean: np.array, std: np.array, minimum: np.array, maximum: np.array):
         # default values (translation = 0, scaling = 1)
-        self.translation = np.zeros_like(data.iloc[0])
-        self.scaling = np.ones_like(data.iloc[0])
-        # compute factors
-        for idx, column in enumerate(data.columns):
-            method = methods.get(column)
-            values = data[column]
-            if method in ['std', 'standardize']:
-                self.translation[idx] = values.mean()
-                self.scaling[idx] = values.std()
-            elif method in ['norm', 'normalize', 'minmax']:
-                self.translation[idx] = values.min()
-                self.scaling[idx] = values.max() - values.min()
-            elif method in ['zero', 'max', 'zeromax']:
-                self.translation[idx] = 0.0
-                self.scaling[idx] = values.max()
-            elif isinstance(method, tuple):
-                minimum, maximum = method
-                self.translation[idx] = minimum
-                self.scaling[idx] = maximum - minimum
-            elif method is not None:
-                raise ValueError(f'Method {method} is not supported')
+        self.translation = np.zeros(len(methods))
+        self.scaling = np.ones(len(methods))
+        # compute factors, grouping columns by method
+        std_mask = np.array([m in ['std', 'standardize'] for m in methods], dtype=bool)
+        minmax_mask = np.array([m in ['norm', 'normalize', 'minmax'] for m in methods], dtype=bool)
+        zeromax_mask = np.array([m in ['zero', 'max', 'zeromax'] for m in methods], dtype=bool)
+        self.translation[std_mask] = mean[std_mask]
+        self.scaling[std_mask] = std[std_mask]
+        self.translation[minmax_mask] = minimum[minmax_mask]
+        self.scaling[minmax_mask] = maximum[minmax_mask] - minimum[minmax_mask]
+        self.scaling[zeromax_mask] = maximum[zeromax_mask]
+        for idx, method in enumerate(methods):
+            if isinstance(method, tuple):
+                lower, upper = method
+                self.translation[idx] = lower
+                self.scaling[idx] = upper - lower
+
+    def fit(self, data: Any):
+        columns, values = self._values(data)
+        methods = self._column_methods(columns)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            self._set_factors(
+                methods=methods,
+                mean=np.nanmean(values, axis=0),
+                std=np.nanstd(values, axis=0, ddof=1),
+                minimum=np.nanmin(values, axis=0),
+                maximum=np.nanmax(values, axis=0)
+            )
+        return self
+
+    def partial_fit(self, data: Any):
+        columns, values = self._values(data)
+        if self.stats is None:
+            self.stats = dict(
+                methods=self._column_methods(columns),
+                count=np.zeros(values.shape[1]),
+                mean=np.zeros(values.shape[1]),
+                m2=np.zeros(values.shape[1]),
+                minimum=np.full(values.shape[1], np.inf),
+                maximum=np.full(values.shape[1], -np.inf)
+            )
+        stats = self.stats
+        # statistics of the chunk (ignoring nan values, as in the batch fit)
+        nans = np.isnan(values)
+        count = (~nans).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(nans, 0., values).sum(axis=0) / count
+            m2 = (np.where(nans, 0., values - mean) ** 2).sum(axis=0)
+            # merge with the running ones using the parallel version of welford's algorithm (chan et al.)
+            total = stats['count'] + count
+            delta = mean - stats['mean']
+            update = count > 0
+            stats['mean'] = np.where(update, stats['mean'] + delta * count / total, stats['mean'])
+            stats['m2'] = np.where(update, stats['m2'] + m2 + delta ** 2 * stats['count'] * count / total, stats['m2'])
+        stats['count'] = total
+        stats['minimum'] = np.fmin(stats['minimum'], np.where(nans, np.inf, values).min(axis=0, initial=np.inf))
+        stats['maximum'] = np.fmax(stats['maximum'], np.where(nans, -np.inf, values).max(axis=0, initial=-np.inf))
+        # factors are always kept consistent with the data seen so far
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self._set_factors(
+                methods=stats['methods'],
+                mean=np.where(stats['count'] > 0, stats['mean'], np.nan),
+                std=np.sqrt(stats['m2'] / (stats['count'] - 1)),
+                minimum=np.where(stats['count'] > 0, stats['minimum'], np.nan),
+                maximum=np.where(stats['count'] > 0, stats['maximum'], np.nan)
+            )
+        return self
 
     def transform(self, data: Any):
         return (data - self.translation) / self.scaling
 
     def inverse_transform(self, data: Any):
         return (data * self.scaling) + self.translation
+
+    def save(self, filepath: str):
+        np.savez(filepath, translation=self.translation, scaling=self.scaling)
+
+    @classmethod
+    def from_factors(cls, translation: np.array, scaling: np.array):
+        # the factors are restored as they are, without fitting them again
+        scaler = cls()
+        scaler.translation = np.array(translation)
+        scaler.scaling = np.array(scaling)
+        return scaler
+
+    @classmethod
+    def load(cls, filepath: str):
+        with np.load(filepath) as factors:
+            return cls.from_factors(translation=factors['translation'], scaling=factors['scaling'])
+
+
+def save_scalers(x_scaler: Scaler, y_scaler: Scaler, filepath: str = '../res/scalers.npz'):
+    np.savez(filepath, x_translation=x_scaler.translation, x_scaling=x_scaler.scaling,
+             y_translation=y_scaler.translation, y_scaling=y_scaler.scaling)
+
+
+def load_scalers(filepath: str = '../res/scalers.npz') -> tuple:
+    with np.load(filepath) as factors:
+        return tuple(
+            Scaler.from_factors(translation=factors[f'{prefix}_translation'], scaling=factors[f'{prefix}_scaling'])
+            for prefix in ['x', 'y']
+        )
@@ -0,0 +1,7 @@
+import pandas as pd
+
+DEFAULT_START = '2020-02-24'
+
+
+def get_delta(date: str, start_date: str = DEFAULT_START) -> int:
+    return (pd.to_datetime(date).date() - pd.to_datetime(start_date).date()).days
@@ -0,0 +1,141 @@
+import multiprocessing as mp
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHANNELS = ('n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths', 'n_infectious', 'n_susceptible')
+
+
+class RunningStats:
+    def __init__(self, shape: tuple):
+        super(RunningStats, self).__init__()
+        # welford's algorithm, storing the number of samples, the running mean and the sum of squared deviations
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, values: np.array):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    def var(self, ddof: int = 1) -> np.array:
+        return self.m2 / (self.count - ddof) if self.count > ddof else np.full_like(self.m2, np.nan)
+
+    def std(self, ddof: int = 1) -> np.array:
+        return np.sqrt(self.var(ddof=ddof))
+
+
+class QuantileSketch:
+    def __init__(self, shape: tuple, q: float):
+        super(QuantileSketch, self).__init__()
+        # P-square algorithm (Jain & Chlamtac, 1985), vectorized over all the cells of the given shape so that each
+        # quantile is tracked with five markers per cell whatever the number of samples
+        self.q = q
+        self.count = 0
+        self.heights = np.zeros((5,) + tuple(shape))
+        self.positions = np.tile(np.arange(1., 6.).reshape((5,) + (1,) * len(shape)), (1,) + tuple(shape))
+        self.desired = np.array([1., 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5.])
+        self.increments = np.array([0., q / 2, q, (1 + q) / 2, 1.])
+
+    def update(self, values: np.array):
+        self.count += 1
+        # the first five samples initialize the markers (which are then sorted)
+        if self.count <= 5:
+            self.heights[self.count - 1] = values
+            if self.count == 5:
+                self.heights.sort(axis=0)
+            return
+        h, n = self.heights, self.positions
+        # find the cell k such that h[k] <= x < h[k + 1], adjusting the extreme markers if needed
+        h[0] = np.minimum(h[0], values)
+        h[4] = np.maximum(h[4], values)
+        k = np.clip((values[None] >= h[1:4]).sum(axis=0), 0, 3)
+        n += np.arange(5).reshape((5,) + (1,) * values.ndim) > k[None]
+        self.desired += self.increments
+        # adjust the heights of the three central markers
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            d = np.where(move, np.sign(d), 0.)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                        (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+                        (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+                )
+                neighbour_h = np.where(d > 0, h[i + 1], h[i - 1])
+                neighbour_n = np.where(d > 0, n[i + 1], n[i - 1])
+                linear = h[i] + d * (neighbour_h - h[i]) / (neighbour_n - n[i])
+            parabolic = np.where((h[i - 1] < parabolic) & (parabolic < h[i + 1]), parabolic, linear)
+            h[i] = np.where(move, parabolic, h[i])
+            n[i] += d
+
+    def value(self) -> np.array:
+        if self.count == 0:
+            return np.full(self.heights.shape[1:], np.nan)
+        elif self.count < 5:
+            return np.quantile(self.heights[:self.count], self.q, axis=0)
+        return self.heights[2].copy()
+
+
+class EnsembleStats:
+    def __init__(self, channels: Iterable[str], n_days: int, quantiles: Iterable[float] = (0.1, 0.5, 0.9)):
+        super(EnsembleStats, self).__init__()
+        self.channels = list(channels)
+        self.moments = RunningStats(shape=(n_days, len(self.channels)))
+        self.sketches = {q: QuantileSketch(shape=(n_days, len(self.channels)), q=q) for q in quantiles}
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def update(self, results: dict):
+        values = np.stack([results[c] for c in self.channels], axis=1).astype('float')
+        self.moments.update(values)
+        for sketch in self.sketches.values():
+            sketch.update(values)
+
+    def mean(self) -> pd.DataFrame:
+        return pd.DataFrame(self.moments.mean, columns=self.channels)
+
+    def std(self) -> pd.DataFrame:
+        return pd.DataFrame(self.moments.std(), columns=self.channels)
+
+    def quantile(self, q: float) -> pd.DataFrame:
+        return pd.DataFrame(self.sketches[q].value(), columns=self.channels)
+
+
+_sim = None
+_channels = None
+
+
+def _init_worker(sim, channels: List[str]):
+    # the base simulation is sent once per worker instead of once per replicate
+    global _sim, _channels
+    _sim, _channels = sim, channels
+
+
+def _run_replicate(idx: int) -> dict:
+    import covasim as cv
+    # single_run copies the base simulation and increments its random seed by the replicate index
+    sim = cv.single_run(_sim, ind=idx, reseed=True, keep_people=False)
+    return {c: sim.results[c].values for c in _channels}
+
+
+def run_ensemble(sim,
+                 n_runs: int = 30,
+                 channels: Iterable[str] = DEFAULT_CHANNELS,
+                 quantiles: Iterable[float] = (0.1, 0.5, 0.9),
+                 n_cpus: Optional[int] = None) -> EnsembleStats:
+    channels = list(channels)
+    stats = None
+    with mp.Pool(processes=n_cpus, initializer=_init_worker, initargs=(sim, channels)) as pool:
+        # replicates are aggregated one at a time and then discarded, in run order rather than completion order since
+        # the quantile sketches (and, up to rounding, the running moments) depend on the order of their inputs
+        for results in pool.imap(_run_replicate, range(n_runs)):
+            if stats is None:
+                stats = EnsembleStats(channels=channels, n_days=len(results[channels[0]]), quantiles=quantiles)
+            stats.update(results)
+    return stats
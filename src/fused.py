@@ -0,0 +1,155 @@
+import time
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from sweep import build_model, compute_scores, config_key
+
+
+class FusedMLP:
+    def __init__(self, configs: List[tuple], inputs: int, outputs: int, seeds: List[int]):
+        super(FusedMLP, self).__init__()
+        import tensorflow as tf
+        # the models share the same depth, and each layer is padded to the largest width among the models so that all
+        # of them are evaluated with a single batched product; padded units are masked, hence they have null outputs
+        # and null gradients and never affect the actual units
+        if len({len(config) for config in configs}) != 1:
+            raise ValueError('Fused models must share the same depth')
+        self.configs = list(configs)
+        self.seeds = list(seeds)
+        self.sizes = np.array([[inputs] + list(config) + [outputs] for config in self.configs])
+        widths = self.sizes.max(axis=0)
+        self.kernels, self.biases, self.masks = [], [], []
+        for layer in range(len(widths) - 1):
+            kernel = np.zeros((len(self.configs), widths[layer], widths[layer + 1]), dtype='float32')
+            mask = np.zeros((len(self.configs), 1, widths[layer + 1]), dtype='float32')
+            for k, (sizes, seed) in enumerate(zip(self.sizes, self.seeds)):
+                # glorot uniform initialization computed on the actual (unpadded) sizes of the layer
+                fan_in, fan_out = sizes[layer], sizes[layer + 1]
+                limit = np.sqrt(6 / (fan_in + fan_out))
+                rng = np.random.default_rng([seed, layer])
+                kernel[k, :fan_in, :fan_out] = rng.uniform(-limit, limit, size=(fan_in, fan_out))
+                mask[k, :, :fan_out] = 1.
+            self.kernels.append(tf.Variable(kernel))
+            self.biases.append(tf.Variable(np.zeros((len(self.configs), 1, widths[layer + 1]), dtype='float32')))
+            self.masks.append(tf.constant(mask))
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    @property
+    def variables(self) -> list:
+        return self.kernels + self.biases
+
+    def predict(self, x):
+        import tensorflow as tf
+        h = tf.broadcast_to(tf.cast(x, 'float32'), (len(self),) + tuple(x.shape))
+        for layer, (kernel, bias, mask) in enumerate(zip(self.kernels, self.biases, self.masks)):
+            h = tf.einsum('kbi,kij->kbj', h, kernel) + bias
+            h = h if layer == len(self.kernels) - 1 else tf.nn.relu(h) * mask
+        return h
+
+    def losses(self, x, y):
+        import tensorflow as tf
+        return tf.reduce_mean(tf.square(self.predict(x) - tf.cast(y, 'float32')), axis=[1, 2])
+
+    def fit(self, x: np.array, y: np.array, validation_split: float = 0.2, epochs: int = 1000, patience: int = 100,
+            batch_size: int = 32, learning_rate: float = 1e-3, random_state: int = 0) -> int:
+        import tensorflow as tf
+        if epochs < 1:
+            raise ValueError(f'The number of epochs must be positive, got {epochs}')
+        # as in keras, the validation data is the last fraction of the data (before shuffling)
+        split = int(len(x) * (1 - validation_split))
+        (xtr, ytr), (xvl, yvl) = (x[:split], y[:split]), (x[split:], y[split:])
+        # adam moments are kept per parameter and the update of stopped models is masked, so that the models are
+        # trained exactly as if they were independent except for the shared order of the mini-batches
+        moments = [(tf.Variable(tf.zeros_like(v)), tf.Variable(tf.zeros_like(v))) for v in self.variables]
+        active = tf.Variable(np.ones(len(self), dtype='float32'))
+        step = tf.Variable(0.)
+        beta_1, beta_2, epsilon = 0.9, 0.999, 1e-7
+
+        @tf.function
+        def train_step(xb, yb):
+            with tf.GradientTape() as tape:
+                loss = tf.reduce_sum(self.losses(xb, yb))
+            gradients = tape.gradient(loss, self.variables)
+            step.assign_add(1.)
+            lr = learning_rate * tf.sqrt(1 - beta_2 ** step) / (1 - beta_1 ** step)
+            for variable, gradient, (m, v) in zip(self.variables, gradients, moments):
+                m.assign(beta_1 * m + (1 - beta_1) * gradient)
+                v.assign(beta_2 * v + (1 - beta_2) * tf.square(gradient))
+                variable.assign_sub(tf.reshape(active, (-1, 1, 1)) * lr * m / (tf.sqrt(v) + epsilon))
+
+        # per-model early stopping on the validation loss, restoring the best weights of each model at the end
+        rng = np.random.default_rng(random_state)
+        best_loss, wait = np.full(len(self), np.inf), np.zeros(len(self), dtype=int)
+        best_weights = [v.numpy() for v in self.variables]
+        for epoch in range(epochs):
+            indices = rng.permutation(len(xtr))
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                train_step(tf.constant(xtr[batch], 'float32'), tf.constant(ytr[batch], 'float32'))
+            val_loss = self.losses(xvl, yvl).numpy()
+            improved = (val_loss < best_loss) & (active.numpy() > 0)
+            best_loss[improved], wait[improved] = val_loss[improved], 0
+            wait[~improved] += 1
+            for weights, variable in zip(best_weights, self.variables):
+                weights[improved] = variable.numpy()[improved]
+            active.assign(np.where(wait >= patience, 0., active.numpy()).astype('float32'))
+            if not np.any(active.numpy()):
+                break
+        for weights, variable in zip(best_weights, self.variables):
+            variable.assign(weights)
+        return epoch + 1
+
+    def unpack(self, k: int):
+        # builds a standalone keras model with the actual (unpadded) weights of the k-th fused model
+        sizes = self.sizes[k]
+        model = build_model(self.configs[k], outputs=sizes[-1])
+        model.build((None, sizes[0]))
+        weights = []
+        for layer, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            weights += [kernel[k, :sizes[layer], :sizes[layer + 1]].numpy(), bias[k, 0, :sizes[layer + 1]].numpy()]
+        model.set_weights(weights)
+        return model
+
+
+def fused_sweep(configurations: Iterable[tuple],
+                xtr: np.array,
+                ytr: np.array,
+                xvl: np.array,
+                yvl: np.array,
+                num_layers: int = 3,
+                seeds: Sequence[int] = (0,),
+                epochs: int = 1000,
+                patience: int = 100,
+                batch_size: int = 32,
+                verbose: bool = True) -> tuple:
+    # configurations are grouped by depth, and every (configuration, seed) pair of a group is a model of a fused net
+    groups = {}
+    for config in configurations:
+        config = tuple(hu for hu in config if hu != 0)
+        groups.setdefault(len(config), []).extend([(config, seed) for seed in seeds])
+    seed_scores, models, start_time = {}, {}, time.time()
+    for depth, group in sorted(groups.items()):
+        group_time = time.time()
+        net = FusedMLP([c for c, _ in group], inputs=xtr.shape[1], outputs=ytr.shape[1], seeds=[s for _, s in group])
+        trained_epochs = net.fit(xtr, ytr, epochs=epochs, patience=patience, batch_size=batch_size)
+        # every (configuration, seed) model is scored and unpacked into a keras model, then the scores of each
+        # configuration are averaged across its seeds (with their standard deviation), so that no seed is selected
+        ptr, pvl = net.predict(xtr).numpy(), net.predict(xvl).numpy()
+        for k, (config, seed) in enumerate(group):
+            key = config_key(config, num_layers)
+            seed_scores.setdefault(key, []).append(compute_scores(ytr, ptr[k], yvl, pvl[k]))
+            models[key + (seed,)] = net.unpack(k)
+        if verbose:
+            print(f'Depth {depth}: {len(group)} models, {trained_epochs} epochs', end='')
+            print(f' -- elapsed time: {time.time() - group_time:.4}s')
+    scores = {}
+    for key, runs in seed_scores.items():
+        runs = pd.DataFrame(runs)
+        scores[key] = {**runs.mean().to_dict(), **runs.std(ddof=0).add_suffix('_std').to_dict(), 'seeds': len(runs)}
+    if verbose:
+        print(f'Sweep time: {time.time() - start_time:.4}s')
+    return scores, models
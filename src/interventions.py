@@ -1,12 +1,11 @@
 import pandas as pd
-import covasim as cv
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 
-DEFAULT_START = '2020-02-24'
+from dates import DEFAULT_START, get_delta
 
-
-def get_delta(date: str, start_date: str = DEFAULT_START) -> int:
-    return (pd.to_datetime(date).date() - pd.to_datetime(start_date).date()).days
+# covasim (and its numba compilation) is imported only when interventions are actually built
+if TYPE_CHECKING:
+    import covasim as cv
 
 
 def get_values(periods: Dict[int, str], mappings: Dict[str, float], postfix: str = '') -> pd.Series:
@@ -14,11 +13,13 @@ def get_values(periods: Dict[int, str], mappings: Dict[str, float], postfix: str
     return periods.map({k: mappings.get(f'{k}{postfix}') for k in periods.unique()})
 
 
-def tests(daily_test: object) -> cv.Intervention:
+def tests(daily_test: object) -> 'cv.Intervention':
+    import covasim as cv
     return cv.test_num(daily_tests=daily_test, quar_policy='both', sensitivity=0.8)
 
 
-def contact_tracing(parameters: Dict[str, float]) -> cv.Intervention:
+def contact_tracing(parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     defaults = dict(
         household_trace_prob=1.0,
         household_trace_time=0.0,
@@ -46,7 +47,8 @@ def contact_tracing(parameters: Dict[str, float]) -> cv.Intervention:
     )
 
 
-def smart_working(periods: pd.Series, parameters: Dict[str, float]) -> cv.Intervention:
+def smart_working(periods: pd.Series, parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     defaults = dict(
         init_work_contacts=1.,
         summer_work_contacts=1.,
@@ -60,7 +62,8 @@ def smart_working(periods: pd.Series, parameters: Dict[str, float]) -> cv.Interv
     return cv.clip_edges(days=v.index.values, changes=v.values, layers='w')
 
 
-def schools_closed(periods: pd.Series, parameters: Dict[str, float]) -> cv.Intervention:
+def schools_closed(periods: pd.Series, parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     defaults = dict(
         init_school_contacts=1.,
         summer_school_contacts=0.,
@@ -75,7 +78,8 @@ def schools_closed(periods: pd.Series, parameters: Dict[str, float]) -> cv.Inter
     return cv.clip_edges(days=v.index.values, changes=v.values, layers='s')
 
 
-def lockdown_interactions(periods: pd.Series, parameters: Dict[str, float]) -> cv.Intervention:
+def lockdown_interactions(periods: pd.Series, parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     defaults = dict(
         init_casual_contacts=1.,
         summer_casual_contacts=1.,
@@ -91,7 +95,8 @@ def lockdown_interactions(periods: pd.Series, parameters: Dict[str, float]) -> c
 
 
 # regional lockdowns to avoid imported cases
-def imported_cases(periods: pd.Series, parameters: Dict[str, float]) -> cv.Intervention:
+def imported_cases(periods: pd.Series, parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     defaults = dict(
         init_imports=parameters.get('init_imports', 0.),
         summer_imports=parameters.get('init_imports', 0.),
@@ -105,7 +110,8 @@ def imported_cases(periods: pd.Series, parameters: Dict[str, float]) -> cv.Inter
 
 
 # summer viral load reduction
-def viral_load_reduction(parameters: Dict[str, float]) -> cv.Intervention:
+def viral_load_reduction(parameters: Dict[str, float]) -> 'cv.Intervention':
+    import covasim as cv
     assert 'init_beta' in parameters
     days = [0, get_delta('2020-05-18'), get_delta('2020-10-01')]
     defaults = dict(
@@ -132,7 +138,7 @@ def viral_load_reduction(parameters: Dict[str, float]) -> cv.Intervention:
 
 def get_interventions(periods: Dict[int, str],
                       parameters: Dict[str, float],
-                      daily_tests: object = 'new_tests') -> List[cv.Intervention]:
+                      daily_tests: object = 'new_tests') -> List['cv.Intervention']:
     periods = pd.Series(periods)
     return [
         tests(daily_tests),
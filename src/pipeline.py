@@ -0,0 +1,86 @@
+import os
+import multiprocessing as mp
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+POP_SIZE = 400e3
+TARGETS = ['peak_hosp', 'cum_diag', 'cum_dead']
+
+# worker state (surrogate model and scalers are loaded once per worker)
+_surrogate = None
+_scalers = None
+
+
+def _init_worker(model_path: str, dataset_path: str, scalers_path: Optional[str]):
+    global _surrogate, _scalers
+    from dataset import load_scalers, process_dataset
+    from eml.net import reader, serialize
+    # both networks in the native format (see eml.net.serialize.convert_keras) and keras saved models are loaded
+    # without importing tensorflow
+    _surrogate = reader.read('native' if serialize.is_native(model_path) else 'saved_model', model_path)
+    # stored scalers are used if available, otherwise they are fitted again on the whole dataset
+    if scalers_path is not None and os.path.exists(scalers_path):
+        _scalers = load_scalers(scalers_path)
+    else:
+        _, _scalers = process_dataset(pd.read_csv(dataset_path), val_split=None, scale_data=True)
+
+
+def _evaluate_region(args: tuple) -> pd.DataFrame:
+    from dataset import process_dataset
+    from policy import PCT_BEDS_HOSP, PCT_BEDS_ICU, solve_policy
+    region, dates, samples, pop_size = args
+    x_scaler, y_scaler = _scalers
+    # surrogate predictions on the real samples
+    (x, y), = process_dataset(samples, val_split=None, scale_data=False)
+    x = x_scaler.transform(x)
+    p = np.array([_surrogate.evaluate(row).layer(-1) for row in x])
+    p = y_scaler.inverse_transform(p)
+    # policy optimization on each real sample
+    capacity = pop_size * (PCT_BEDS_HOSP + PCT_BEDS_ICU)
+    predicted = [solve_policy(_surrogate, row, x_scaler, y_scaler, capacity) for _, row in samples.iterrows()]
+    df = pd.DataFrame({
+        'region': region,
+        'date': dates,
+        'init_zone': samples['init_zone'].values,
+        'real': samples['actuated_zone'].values,
+        'predicted': predicted
+    })
+    for idx, target in enumerate(TARGETS):
+        df[target] = y[:, idx]
+        df[f'predicted_{target}'] = p[:, idx]
+    return df
+
+
+def evaluate_regions(regions: pd.DataFrame,
+                     model_path: str = '../res/surrogate',
+                     dataset_path: str = '../res/dataset.csv',
+                     scalers_path: Optional[str] = '../res/scalers.npz',
+                     output_path: Optional[str] = None,
+                     pop_size: float = POP_SIZE,
+                     time_interval: int = 21,
+                     n_workers: Optional[int] = None,
+                     **kwargs) -> pd.DataFrame:
+    from data import get_zones_samples
+    # regions is a table with 'region', 'population' and 'zones' columns (the latter being a date -> zone dictionary),
+    # and the real samples of all the regions are extracted at once with the respective scaling factors
+    regions = pd.DataFrame(regions).set_index('region')
+    samples = get_zones_samples(
+        zones=regions['zones'].to_dict(),
+        scaling_factor=(regions['population'] / pop_size).to_dict(),
+        time_interval=time_interval,
+        **kwargs
+    )
+    tasks = [
+        (region, list(zones.keys())[:-1], samples.loc[[region]].reset_index(drop=True), pop_size)
+        for region, zones in regions['zones'].items() if len(zones) > 1
+    ]
+    # then each region is evaluated (surrogate prediction and policy optimization) in a worker process
+    initargs = (model_path, dataset_path, scalers_path)
+    with mp.Pool(processes=n_workers, initializer=_init_worker, initargs=initargs) as pool:
+        results = pool.map(_evaluate_region, tasks, chunksize=1)
+    results = pd.concat(results, ignore_index=True)
+    if output_path is not None:
+        results.to_csv(output_path, index=False)
+    return results
@@ -0,0 +1,66 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import docplex.mp.model as cpx
+
+from dataset import one_hot_zones
+from eml.backend import cplex_backend
+from eml.net import embed
+from eml.net.process import ibr_bounds
+
+zones_dictionary = {tuple(v): k for k, v in one_hot_zones.items()}
+
+PCT_BEDS_HOSP = 370.4 / 100e3
+PCT_BEDS_ICU = 14.46 / 100e3
+
+
+def build_cplex_model(surrogate_model, input_data: pd.Series, x_scaler, y_scaler, hospital_capacity: float,
+                      rolling_days: int = 7) -> tuple:
+    # PREPROCESS INPUT DATA
+    init_zone = one_hot_zones[input_data['init_zone']]
+    input_data = pd.DataFrame(input_data.values[:-2].reshape(-1, 3).astype('float'), columns=['hosp', 'diag', 'dead'])
+    input_data = input_data.head(len(input_data) // 2).copy()
+    input_features = input_data.rolling(rolling_days).mean().iloc[rolling_days - 1:].values.transpose().flatten()
+    # add trailing zeros to match scaler expected size, then remove them
+    input_features = list(x_scaler.transform(list(input_features) + init_zone + [0] * 4)[:-4])
+    # BUILD SURROGATE MODEL
+    # bounds are tightened in place, thus a copy of the (already converted) surrogate model is used
+    surrogate_model = copy.deepcopy(surrogate_model)
+    # input features have a fixed values, then we have 4 more values for the decision variables (0/1, being binary)
+    surrogate_model.layer(0).update_lb(np.array(input_features + [0] * 4))
+    surrogate_model.layer(0).update_ub(np.array(input_features + [1] * 4))
+    ibr_bounds(surrogate_model)
+    # BUILD INPUT/OUTPUT CPLEX VARIABLES WITH RESPECTIVE CONSTRAINED VALUES
+    backend = cplex_backend.CplexBackend()
+    cplex_model = cpx.Model()
+    x_variables, y_variables = [], []
+    for idx, val in enumerate(input_features):
+        var = cplex_model.continuous_var(lb=val, ub=val, name=f'feature_{idx}')
+        x_variables.append(var)
+    for name in ['peak_hosp', 'cum_diag', 'cum_dead']:
+        y_variables.append(cplex_model.continuous_var(name=name))
+    # binary decision variables (constrained so that is just one of them)
+    decision_variables = cplex_model.binary_var_list(keys=4, name=f'zones')
+    cplex_model.add_constraint(sum(decision_variables) == 1)
+    embed.encode(backend, surrogate_model, cplex_model, x_variables + decision_variables, y_variables, 'model')
+    # ADD CONSTRAINTS AND OBJECTIVE
+    y_variables = np.array(y_variables).reshape(1, -1)
+    y_variables = y_scaler.inverse_transform(y_variables).flatten()
+    # constraint the output values so that the peak of hospitalized does not exceed 30% of the hospital capacity
+    # and the total number of cases and deaths do not exceed the 85% of those same values related to the previous weeks
+    bounds = [0.3 * hospital_capacity, 0.85 * input_data['diag'].sum(), 0.85 * input_data['dead'].sum()]
+    cplex_model.add_constraints([yv <= bound for yv, bound in zip(y_variables, bounds)])
+    cplex_model.minimize(sum([idx * d for idx, d in enumerate(decision_variables)]))
+    return cplex_model, decision_variables
+
+
+def solve_policy(surrogate_model, input_data: pd.Series, x_scaler, y_scaler, hospital_capacity: float,
+                 rolling_days: int = 7) -> str:
+    model, variables = build_cplex_model(surrogate_model, input_data, x_scaler, y_scaler, hospital_capacity,
+                                         rolling_days=rolling_days)
+    solution = model.solve()
+    # if no zone satisfies the constraints, the strictest one is returned with an asterisk
+    if solution is None:
+        return 'R*'
+    return zones_dictionary[tuple([int(round(v.solution_value)) for v in variables])]
@@ -0,0 +1,80 @@
+import os
+import glob
+import json
+import hashlib
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'res', 'sweep')
+
+
+def arrays_hash(*arrays: np.array) -> str:
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype}{array.shape}'.encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class ResultsStore:
+    def __init__(self, root: str = DEFAULT_ROOT):
+        super(ResultsStore, self).__init__()
+        self.root = root
+
+    @staticmethod
+    def descriptor(data: Any, config: tuple, seed: Optional[int] = None, **hyperparameters) -> dict:
+        # data identifies the training data, i.e., either a content hash or a dictionary with the dataset hash and the
+        # feature configuration (rolling days, validation split, ...), while zero units in the config are ignored
+        return dict(data=data, config=[int(hu) for hu in config if hu != 0], seed=seed, **hyperparameters)
+
+    @staticmethod
+    def key(descriptor: dict) -> str:
+        return hashlib.sha1(json.dumps(descriptor, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key: str, extension: str) -> str:
+        return os.path.join(self.root, f'{key}.{extension}')
+
+    def __contains__(self, key: str) -> bool:
+        # the metrics file is written last, thus an entry is complete only if it exists
+        return os.path.exists(self.path(key, 'json'))
+
+    def get(self, key: str) -> Optional[tuple]:
+        if key not in self:
+            return None
+        with open(self.path(key, 'json'), 'r') as file:
+            entry = json.load(file)
+        with np.load(self.path(key, 'npz')) as arrays:
+            weights = [arrays[f'w{idx}'] for idx in range(len(arrays.files))]
+        return entry['scores'], weights
+
+    def put(self, key: str, descriptor: dict, scores: dict, weights: List[np.array]):
+        os.makedirs(self.root, exist_ok=True)
+        # both files are written to temporary files first and then moved, so that a sweep interrupted at any point
+        # leaves either a complete entry or no entry at all
+        with open(f'{self.path(key, "npz")}.tmp', 'wb') as file:
+            np.savez(file, **{f'w{idx}': w for idx, w in enumerate(weights)})
+        os.replace(f'{self.path(key, "npz")}.tmp', self.path(key, 'npz'))
+        with open(f'{self.path(key, "json")}.tmp', 'w') as file:
+            json.dump(dict(descriptor=descriptor, scores={k: float(v) for k, v in scores.items()}), file, indent=2)
+        os.replace(f'{self.path(key, "json")}.tmp', self.path(key, 'json'))
+
+    def load_model(self, key: str):
+        from sweep import build_model
+        with open(self.path(key, 'json'), 'r') as file:
+            config = json.load(file)['descriptor']['config']
+        _, weights = self.get(key)
+        model = build_model(config, outputs=weights[-1].shape[0])
+        model.build((None, weights[0].shape[0]))
+        model.set_weights(weights)
+        return model
+
+    def table(self) -> pd.DataFrame:
+        rows = []
+        for path in sorted(glob.glob(os.path.join(self.root, '*.json'))):
+            with open(path, 'r') as file:
+                entry = json.load(file)
+            rows.append({'key': os.path.basename(path)[:-5], **entry['descriptor'], **entry['scores']})
+        return pd.DataFrame(rows)
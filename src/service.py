@@ -0,0 +1,173 @@
+import time
+import queue
+import itertools
+import multiprocessing as mp
+import traceback
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_CHANNELS = ('n_severe', 'n_critical', 'cum_diagnoses', 'cum_deaths')
+POPULATION_KEYS = ('pop_type', 'pop_size', 'location', 'rand_seed')
+POLL_INTERVAL = 1.
+
+# worker state, which is kept warm between requests
+_data = None
+_people = OrderedDict()
+_max_people = 16
+
+
+def _warm_up(region: str, scaling_factor: float, data_kwargs: dict):
+    global _data
+    import covasim as cv
+    from data import get_regional_data
+    # the datafile of the simulations is read through the data store (source, offline and max_age are passed as they
+    # are, so that workers on nodes without internet access can rely on local snapshots)
+    _data = get_regional_data(scaling_factor=scaling_factor, region=region, **data_kwargs)
+    # a tiny simulation triggers the numba compilation of the simulator internals
+    cv.Sim(pop_size=1000, n_days=5, verbose=0).run()
+
+
+def _get_people(pars: dict):
+    import covasim as cv
+    import sciris as sc
+    key = tuple(pars.get(k) for k in POPULATION_KEYS)
+    if key in _people:
+        _people.move_to_end(key)
+    else:
+        sim = cv.Sim(pars={k: pars[k] for k in POPULATION_KEYS if k in pars}, verbose=0)
+        sim.set_seed()
+        _people[key] = cv.make_people(sim)
+        if len(_people) > _max_people:
+            _people.popitem(last=False)
+    # the simulation changes the population status, thus a copy of the cached one is returned
+    return sc.dcp(_people[key])
+
+
+def _get_interventions(spec: Optional[dict]) -> list:
+    import interventions
+    if spec is None:
+        return []
+    spec = dict(spec)
+    kind = spec.pop('type', 'calibration')
+    if kind == 'calibration':
+        return interventions.get_calibration_interventions(**spec)
+    elif kind == 'sampling':
+        return interventions.get_sampling_interventions(**spec)
+    else:
+        raise ValueError(f'{kind} is not a supported interventions type')
+
+
+def _simulate(request: dict) -> dict:
+    import covasim as cv
+    pars = {**request['params'], 'rand_seed': request.get('seed', 0)}
+    people = _get_people(pars)
+    sim = cv.Sim(pars=pars, interventions=_get_interventions(request.get('interventions')),
+                 datafile=_data, popfile=people, load_pop=True)
+    sim.run()
+    results = {c: np.array(sim.results[c].values) for c in request.get('channels', DEFAULT_CHANNELS)}
+    # optionally compute the mismatch with respect to the regional data
+    if request.get('fit') is not None:
+        results['mismatch'] = sim.compute_fit(**request['fit']).mismatch
+    return results
+
+
+def _serve(requests: mp.Queue, responses: mp.Queue, region: str, scaling_factor: float, max_people: int,
+           data_kwargs: dict):
+    global _max_people
+    _max_people = max_people
+    _warm_up(region=region, scaling_factor=scaling_factor, data_kwargs=data_kwargs)
+    responses.put((None, 'ready', None))
+    for idx, request in iter(requests.get, None):
+        try:
+            responses.put((idx, _simulate(request), None))
+        except Exception:
+            responses.put((idx, None, traceback.format_exc()))
+
+
+class SimulationService:
+    def __init__(self,
+                 n_workers: Optional[int] = None,
+                 region: str = 'Emilia-Romagna',
+                 scaling_factor: float = 1,
+                 max_people: int = 16,
+                 source: Optional[str] = None,
+                 offline: bool = False,
+                 max_age: Optional[int] = 1):
+        super(SimulationService, self).__init__()
+        n_workers = mp.cpu_count() if n_workers is None else n_workers
+        # the default source is the one of get_regional_data
+        data_kwargs = dict(offline=offline, max_age=max_age, **({} if source is None else dict(source=source)))
+        self.requests = mp.Queue()
+        self.responses = mp.Queue()
+        self.workers = [
+            mp.Process(target=_serve,
+                       args=(self.requests, self.responses, region, scaling_factor, max_people, data_kwargs),
+                       daemon=True)
+            for _ in range(n_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self.counter = itertools.count()
+        self.completed = {}
+        self.ready = 0
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.ready < len(self.workers):
+            self._receive(deadline)
+
+    def _receive(self, deadline: Optional[float] = None):
+        # responses are polled, so that crashed workers (e.g., killed by the os) are detected instead of waiting forever
+        while True:
+            try:
+                idx, result, error = self.responses.get(timeout=POLL_INTERVAL)
+                break
+            except queue.Empty:
+                dead = [worker for worker in self.workers if not worker.is_alive()]
+                if len(dead) > 0:
+                    exitcodes = [worker.exitcode for worker in dead]
+                    raise RuntimeError(f'{len(dead)} simulation worker(s) died unexpectedly (exit codes {exitcodes})')
+                if deadline is not None and time.time() > deadline:
+                    raise TimeoutError('No response from the simulation workers within the timeout')
+        if idx is None:
+            self.ready += 1
+        else:
+            self.completed[idx] = (result, error)
+
+    def submit(self,
+               params: dict,
+               interventions: Optional[dict] = None,
+               seed: int = 0,
+               channels: Iterable[str] = DEFAULT_CHANNELS,
+               fit: Optional[dict] = None) -> int:
+        idx = next(self.counter)
+        request = dict(params=params, interventions=interventions, seed=seed, channels=list(channels), fit=fit)
+        self.requests.put((idx, request))
+        return idx
+
+    def result(self, idx: int, timeout: Optional[float] = None) -> Dict[str, np.array]:
+        deadline = None if timeout is None else time.time() + timeout
+        while idx not in self.completed:
+            self._receive(deadline)
+        result, error = self.completed.pop(idx)
+        if error is not None:
+            raise RuntimeError(f'Simulation request {idx} failed:\n{error}')
+        return result
+
+    def map(self, requests: Iterable[dict]) -> List[Dict[str, np.array]]:
+        indices = [self.submit(**request) for request in requests]
+        return [self.result(idx) for idx in indices]
+
+    def close(self):
+        for _ in self.workers:
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
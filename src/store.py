@@ -0,0 +1,62 @@
+import os
+import glob
+import hashlib
+import datetime
+import warnings
+from typing import Optional
+
+import pandas as pd
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'res', 'store')
+
+
+class DataStore:
+    def __init__(self, root: str = DEFAULT_ROOT):
+        super(DataStore, self).__init__()
+        self.root = root
+        self.cache = {}
+
+    @staticmethod
+    def is_remote(source: str) -> bool:
+        return source.startswith(('http://', 'https://', 'ftp://'))
+
+    @staticmethod
+    def key(source: str) -> str:
+        return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+    def snapshots(self, source: str, name: str = 'raw') -> list:
+        # snapshots are named after the source key, the kind of content (i.e., how the source was read) and their
+        # ingestion date, thus the lexicographic order is temporal
+        return sorted(glob.glob(os.path.join(self.root, f'{self.key(source)}_{name}_*.pkl')))
+
+    @staticmethod
+    def snapshot_date(path: str) -> datetime.date:
+        return datetime.datetime.strptime(os.path.basename(path)[-12:-4], '%Y%m%d').date()
+
+    def ingest(self, source: str, name: str = 'raw', reader=pd.read_csv, **kwargs) -> str:
+        df = reader(source, **kwargs)
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f'{self.key(source)}_{name}_{datetime.date.today().strftime("%Y%m%d")}.pkl')
+        # write to a temporary file first so that concurrent readers never see a partial snapshot
+        df.to_pickle(f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+        self.cache[path] = df
+        return path
+
+    def load(self, source: str, name: str = 'raw', offline: bool = False, max_age: Optional[int] = 1,
+             reader=pd.read_csv, **kwargs) -> pd.DataFrame:
+        snapshots = self.snapshots(source, name=name)
+        path = snapshots[-1] if len(snapshots) > 0 else None
+        age = None if path is None else (datetime.date.today() - self.snapshot_date(path)).days
+        # a snapshot is refreshed when it is older than max_age days (if max_age is None, it never expires), unless
+        # the source is remote and the store is offline, in which case the most recent snapshot is used anyway
+        if path is None or (max_age is not None and age > max_age):
+            if offline and self.is_remote(source):
+                if path is None:
+                    raise FileNotFoundError(f'No local snapshot of {source} is available in offline mode')
+                warnings.warn(f'Using a snapshot of {source} which is {age} days old since the store is offline')
+            else:
+                path = self.ingest(source, name=name, reader=reader, **kwargs)
+        if path not in self.cache:
+            self.cache[path] = pd.read_pickle(path)
+        return self.cache[path]
@@ -0,0 +1,199 @@
+import os
+import time
+import multiprocessing as mp
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from results import ResultsStore, arrays_hash
+
+# worker state (training data is sent once per worker)
+_data = None
+
+
+def config_key(config: tuple, num_layers: int) -> tuple:
+    # configurations are padded with zeros up to the maximal number of layers, as in the results table
+    config = tuple(config) + (0,) * num_layers
+    config = config[:num_layers]
+    return (0,) if config == () else config
+
+
+def build_model(config: tuple, outputs: int = 3):
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import Dense
+    model = Sequential([Dense(hu, activation='relu') for hu in config if hu != 0] + [Dense(outputs)])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+def evaluate_model(model, xtr: np.array, ytr: np.array, xvl: np.array, yvl: np.array) -> dict:
+    return compute_scores(ytr, model.predict(xtr, verbose=False), yvl, model.predict(xvl, verbose=False))
+
+
+def compute_scores(ytr: np.array, ptr: np.array, yvl: np.array, pvl: np.array) -> dict:
+    from sklearn.metrics import mean_squared_error, r2_score
+    return {
+        'train_mse': mean_squared_error(ytr, ptr),
+        'train_r2': r2_score(ytr, ptr),
+        'val_mse': mean_squared_error(yvl, pvl),
+        'val_r2': r2_score(yvl, pvl)
+    }
+
+
+def train_config(config: tuple, xtr: np.array, ytr: np.array, xvl: np.array, yvl: np.array, epochs: int = 1000,
+                 patience: int = 100, seed: Optional[int] = None) -> tuple:
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    if seed is not None:
+        tf.random.set_seed(seed)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+    model = build_model(config, outputs=ytr.shape[1])
+    model.fit(xtr, ytr, validation_split=0.2, epochs=epochs, callbacks=[early_stopping], verbose=False)
+    return model, evaluate_model(model, xtr, ytr, xvl, yvl)
+
+
+def _init_worker(data: tuple, threads: int):
+    global _data
+    # each worker uses a single intra-op thread (small dense models would otherwise oversubscribe the cores); this
+    # must happen before tensorflow runs any operation, thus in a freshly spawned process
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    _data = data
+
+
+def _train_worker(args: tuple) -> tuple:
+    config, key, epochs, patience, seed = args
+    start_time = time.time()
+    model, scores = train_config(config, *_data, epochs=epochs, patience=patience, seed=seed)
+    return config, key, scores, model.get_weights(), time.time() - start_time
+
+
+def parallel_sweep(configurations: Iterable[tuple],
+                   xtr: np.array,
+                   ytr: np.array,
+                   xvl: np.array,
+                   yvl: np.array,
+                   num_layers: int = 3,
+                   epochs: int = 1000,
+                   patience: int = 100,
+                   n_workers: Optional[int] = None,
+                   threads: int = 1,
+                   seed: Optional[int] = None,
+                   store: Optional[ResultsStore] = None,
+                   data_key: Any = None,
+                   measure_serial: bool = False,
+                   verbose: bool = True) -> tuple:
+    configurations = list(configurations)
+    n_workers = mp.cpu_count() // threads if n_workers is None else n_workers
+    scores, elapsed, start_time = {}, {}, time.time()
+    # when a results store is given, the configurations which were already trained on the same data (identified by
+    # data_key, or by the hash of the arrays themselves) with the same hyperparameters are loaded rather than trained
+    tasks, descriptors = [], {}
+    for config in configurations:
+        key = None
+        if store is not None:
+            data_key = arrays_hash(xtr, ytr, xvl, yvl) if data_key is None else data_key
+            descriptor = store.descriptor(data_key, config, seed=seed, epochs=epochs, patience=patience)
+            key = store.key(descriptor)
+            descriptors[key] = descriptor
+            if key in store:
+                scores[config_key(config, num_layers)], _ = store.get(key)
+                continue
+        tasks.append((config, key, epochs, patience, seed))
+    loaded = len(scores)
+    if verbose and loaded > 0:
+        print(f'{loaded}/{len(configurations)} models loaded from the results store')
+    # processes are spawned rather than forked, since a forked tensorflow runtime is not safe to use
+    context = mp.get_context('spawn')
+    initargs = ((xtr, ytr, xvl, yvl), threads)
+    if len(tasks) > 0:
+        with context.Pool(processes=min(n_workers, len(tasks)), initializer=_init_worker, initargs=initargs) as pool:
+            for idx, (config, key, config_scores, weights, config_time) in enumerate(
+                    pool.imap_unordered(_train_worker, tasks)):
+                scores[config_key(config, num_layers)] = config_scores
+                elapsed[config] = config_time
+                # each model is stored as soon as it is trained, so that an interrupted sweep can be resumed
+                if store is not None:
+                    store.put(key, descriptors[key], config_scores, weights)
+                if verbose:
+                    print(f'Model {idx + 1:0{len(str(len(tasks)))}}/{len(tasks)} {config}', end='')
+                    print(f' -- elapsed time: {config_time:.4}s')
+    # the estimated serial time is the sum of the training times measured inside the workers, i.e., with single-thread
+    # tensorflow pools competing for the same cores and without the worker startup (which is part of the wall time),
+    # thus it is not the time of the serial loop, which is actually measured (in-process, with the default tensorflow
+    # thread pools) only if measure_serial is set
+    wall_time = time.time() - start_time
+    timing = dict(wall_time=wall_time, estimated_serial_time=sum(elapsed.values(), 0.0), loaded=loaded)
+    timing['estimated_speedup'] = timing['estimated_serial_time'] / wall_time
+    if measure_serial:
+        serial_time = time.time()
+        for config, _, _, _, _ in tasks:
+            train_config(config, xtr, ytr, xvl, yvl, epochs=epochs, patience=patience, seed=seed)
+        timing['serial_time'] = time.time() - serial_time
+        timing['speedup'] = timing['serial_time'] / wall_time
+    if verbose:
+        print(f'Sweep time: {wall_time:.4}s, ', end='')
+        print(f'estimated serial time: {timing["estimated_serial_time"]:.4}s ', end='')
+        print(f'(estimated speedup: {timing["estimated_speedup"]:.2f}x)', end='')
+        if measure_serial:
+            print(f', serial time: {timing["serial_time"]:.4}s (speedup: {timing["speedup"]:.2f}x)', end='')
+        print(f', {loaded}/{len(configurations)} models loaded from the results store' if loaded > 0 else '')
+    return scores, timing
+
+
+def successive_halving(configurations: Iterable[tuple],
+                       xtr: np.array,
+                       ytr: np.array,
+                       xvl: np.array,
+                       yvl: np.array,
+                       num_layers: int = 3,
+                       min_epochs: int = 30,
+                       max_epochs: int = 1000,
+                       eta: int = 3,
+                       patience: int = 100,
+                       verbose: bool = True) -> tuple:
+    import pandas as pd
+    from tensorflow.keras.callbacks import EarlyStopping
+    configurations = list(configurations)
+    models = {config: build_model(config, outputs=ytr.shape[1]) for config in configurations}
+    trained, converged, scores = {config: 0 for config in configurations}, set(), {}
+    candidates, epochs, rung = configurations, min(min_epochs, max_epochs), 0
+    while True:
+        # every candidate is trained up to the epochs budget of the rung, resuming from the previous rung, while the
+        # converged ones are promoted with their last scores
+        for idx, config in enumerate(candidates):
+            if config in converged:
+                scores[config_key(config, num_layers)]['rung'] = rung
+                continue
+            if verbose:
+                print(f'Rung {rung} ({epochs} epochs) -- ', end='')
+                print(f'Model {idx + 1:0{len(str(len(candidates)))}}/{len(candidates)} {config}', end='')
+            start_time = time.time()
+            early_stopping = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+            models[config].fit(xtr, ytr, validation_split=0.2, initial_epoch=trained[config], epochs=epochs,
+                               callbacks=[early_stopping], verbose=False)
+            # models which already met the early stopping criterion are not trained any further
+            if early_stopping.stopped_epoch > 0:
+                converged.add(config)
+                trained[config] = early_stopping.stopped_epoch + 1
+            else:
+                trained[config] = epochs
+            scores[config_key(config, num_layers)] = evaluate_model(models[config], xtr, ytr, xvl, yvl)
+            scores[config_key(config, num_layers)]['epochs'] = trained[config]
+            scores[config_key(config, num_layers)]['rung'] = rung
+            if verbose:
+                print(f' -- elapsed time: {time.time() - start_time:.4}s')
+        if len(candidates) <= 1 or epochs >= max_epochs:
+            break
+        # only the best 1 / eta fraction of the candidates (by validation loss) is promoted to the next rung
+        candidates = sorted(candidates, key=lambda c: scores[config_key(c, num_layers)]['val_mse'])
+        for config in candidates[max(1, len(candidates) // eta):]:
+            del models[config]
+        candidates = candidates[:max(1, len(candidates) // eta)]
+        epochs, rung = min(epochs * eta, max_epochs), rung + 1
+    # configurations are ranked by validation score within the last rung they reached, so that the best candidate of
+    # the last rung (either trained or converged earlier) is the first row of the table
+    results = pd.DataFrame.from_dict(scores, orient='index').sort_values(['rung', 'val_r2'], ascending=False)
+    return results, results.index[0]